@@ -6,16 +6,13 @@ BasicAuth and SessionAuth mechanisms.
 """
 
 from os import getenv
-from api.v1.views import app_views
+import math
 from flask import Flask, jsonify, abort, request
 from flask_cors import CORS
 from api.v1.auth.auth import Auth
+from api.v1.auth.rate_limit import TooManyRequests
 from api.v1.auth.session_auth import SessionAuth  # Import SessionAuth
-
-# Initialize Flask app
-app = Flask(__name__)
-app.register_blueprint(app_views)
-CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
+from api.v1 import metrics
 
 # Initialize auth to None
 auth = None
@@ -31,19 +28,33 @@ elif auth_type == "session_auth":
 else:
     auth = Auth()
 
+# Paths that don't require authentication, compiled once into a matcher
+EXCLUDED_PATHS = (
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+    '/api/v1/auth_session/login/'
+)
+# The metrics are public only if opted in (METRICS_PUBLIC=1)
+if metrics.PUBLIC:
+    EXCLUDED_PATHS += ('/api/v1/metrics/',)
+auth.exclude_paths(EXCLUDED_PATHS)
+
+# Views import `auth` from this module: import them once it's set
+from api.v1.views import app_views  # noqa: E402
+
+# Initialize Flask app
+app = Flask(__name__)
+app.register_blueprint(app_views)
+CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
+
 
 @app.before_request
 def before_request():
     """Filter each request with authentication"""
     if auth is None:
         return
-    excluded_paths = [
-        '/api/v1/status/',
-        '/api/v1/unauthorized/',
-        '/api/v1/forbidden/',
-        '/api/v1/auth_session/login/'
-    ]
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, auth.excluded_paths):
         return
     if auth.authorization_header(
             request) is None and auth.session_cookie(request) is None:
@@ -80,6 +91,39 @@ def forbidden(error) -> str:
     return jsonify({"error": "Forbidden"}), 403
 
 
+@app.errorhandler(TooManyRequests)
+def too_many_requests(error) -> str:
+    """
+    Error handler for throttled password attempts.
+    It returns a 429 JSON response telling when to retry.
+    """
+    response = jsonify({"error": "Too many requests"})
+    response.headers["Retry-After"] = str(math.ceil(error.retry_after))
+    return response, 429
+
+
+# Time each authentication stage and each view. Switched off (METRICS=0),
+# nothing is wrapped and requests run the plain functions. Only this
+# module's app and auth instance are wrapped, never shared classes: run
+# as `python3 -m api.v1.app`, this module is executed twice (as __main__
+# and when the views import it) and calls must not be timed twice
+if metrics.ENABLED:
+    app.before_request_funcs[None] = [
+        metrics.timed(func, metrics.STAGES.labels("before_request"))
+        for func in app.before_request_funcs[None]]
+    for method, stage in (("require_auth", "require_auth"),
+                          ("authorization_header", "authorization_header"),
+                          ("session_cookie", "session_cookie"),
+                          ("current_user", "current_user"),
+                          ("search_users", "user_search"),
+                          ("check_password", "password_check")):
+        setattr(auth, method, metrics.timed(getattr(auth, method),
+                                            metrics.STAGES.labels(stage)))
+    for endpoint, view in list(app.view_functions.items()):
+        app.view_functions[endpoint] = metrics.timed(
+            view, metrics.VIEWS.labels(endpoint))
+
+
 if __name__ == "__main__":
     """
     Run the Flask app on the specified host and port. The default host is
@@ -1,13 +1,64 @@
 #!/usr/bin/env python3
 """ Authentication class for the API with wildcard support """
+from api.v1.auth.rate_limit import TokenBucketLimiter, TooManyRequests
 from flask import request
-from typing import List, TypeVar
+from functools import lru_cache
+from typing import List, Pattern, Tuple, TypeVar
+from models.user import User
 import fnmatch
 import os
+import re
+
+
+@lru_cache(maxsize=32)
+def compile_excluded_paths(excluded_paths: Tuple[str, ...]) -> Pattern:
+    """
+    Compiles excluded path patterns into a single regular expression.
+
+    Trailing slashes of the patterns are ignored and wildcards follow
+    fnmatch rules (`*`, `?`, `[seq]`).
+
+    Args:
+        excluded_paths (Tuple[str, ...]): Paths that don't require auth.
+
+    Returns:
+        Pattern: Regular expression matching any path stripped of its
+        trailing slashes that matches one of the patterns.
+    """
+    return re.compile("|".join(
+        "(?:{})".format(fnmatch.translate(excluded_path.rstrip('/')))
+        for excluded_path in excluded_paths))
 
 
 class Auth:
     """ Authentication class to manage authentication for the API """
+    # Name of the session cookie, read once at start-up
+    session_name = os.getenv('SESSION_NAME')
+    # Failed password attempts allowed per client address and per email:
+    # a burst of LOGIN_BURST, then LOGIN_RATE per second (0: unlimited)
+    login_limiter = TokenBucketLimiter(
+        float(os.getenv('LOGIN_RATE', '1')),
+        float(os.getenv('LOGIN_BURST', '10')),
+        int(os.getenv('LOGIN_LIMITER_SIZE', '10000')))
+    # Failed password attempts allowed in total, shedding the load of a
+    # burst from many addresses (0: unlimited)
+    global_login_limiter = TokenBucketLimiter(
+        float(os.getenv('LOGIN_GLOBAL_RATE', '0')),
+        float(os.getenv('LOGIN_GLOBAL_BURST', '100')), 1)
+    # Paths set by exclude_paths() and their compiled matcher
+    excluded_paths = ()
+    _excluded_matcher = None
+
+    def exclude_paths(self, excluded_paths: List[str]):
+        """
+        Sets the paths that don't require authentication, compiling them
+        once for every later call to require_auth with the same paths.
+
+        Args:
+            excluded_paths (List[str]): List of paths that don't require auth.
+        """
+        self.excluded_paths = tuple(excluded_paths)
+        self._excluded_matcher = compile_excluded_paths(self.excluded_paths)
 
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
         """
@@ -23,15 +74,12 @@ class Auth:
         if path is None or excluded_paths is None or len(excluded_paths) == 0:
             return True
 
-        # Strip trailing slashes from path
-        path = path.rstrip('/')
-        # Check against all excluded paths
-        for excluded_path in excluded_paths:
-            # Remove trailing slashes and support wildcards
-            if fnmatch.fnmatch(path, excluded_path.rstrip('/')):
-                return False
-
-        return True
+        if excluded_paths is self.excluded_paths:
+            matcher = self._excluded_matcher
+        else:
+            matcher = compile_excluded_paths(tuple(excluded_paths))
+        # Match the path without its trailing slashes
+        return matcher.match(path.rstrip('/')) is None
 
     def authorization_header(self, request=None) -> str:
         """ Returns the Authorization header value if it exists, else None """
@@ -43,6 +91,57 @@ class Auth:
         """ Returns None for now, request will be used later """
         return None
 
+    def search_users(self, attributes: dict) -> List[TypeVar('User')]:
+        """ Users with matching attributes (a method of the instance, so
+        that the app can time it as the `user_search` stage) """
+        return User.search(attributes)
+
+    def check_password(self, user: TypeVar('User'), pwd: str) -> bool:
+        """ True if pwd is the password of user (timed by the app as the
+        `password_check` stage) """
+        return user.is_valid_password(pwd)
+
+    def _login_keys(self, request, email: str) -> tuple:
+        """ Keys of the per-client buckets of a password attempt """
+        return (('address', request.remote_addr),
+                ('email', email.strip().lower()))
+
+    def throttle_login(self, request, email: str):
+        """
+        Checks that a password attempt is allowed, before checking the
+        password. Only failed attempts are counted, by login_failed().
+
+        Args:
+            request: The HTTP request object.
+            email (str): The email the attempt is for.
+
+        Raises:
+            TooManyRequests: If the client address or the email ran out of
+            attempts, or if all clients together did.
+        """
+        retry_after = self.login_limiter.check(
+            self._login_keys(request, email))
+        if retry_after == 0:
+            retry_after = self.global_login_limiter.check(('*',))
+        if retry_after > 0:
+            raise TooManyRequests(retry_after)
+
+    def login_failed(self, request, email: str):
+        """
+        Counts a failed password attempt (unknown email or wrong
+        password) against the client address, the email and all clients.
+
+        Args:
+            request: The HTTP request object.
+            email (str): The email the attempt was for.
+        """
+        self.login_limiter.acquire(self._login_keys(request, email))
+        self.global_login_limiter.acquire(('*',))
+
+    def destroy_user_sessions(self, user_id: str) -> int:
+        """ Revokes all sessions of a User; none without sessions """
+        return 0
+
     def session_cookie(self, request=None):
         """
         Retrieves the value of the session cookie from a request.
@@ -56,10 +155,9 @@ class Auth:
         if request is None:
             return None
 
-        # Get the name of the session cookie from the environment variable
-        session_name = os.getenv('SESSION_NAME')
-        if not session_name:
+        # Name of the session cookie, from the SESSION_NAME variable
+        if not self.session_name:
             return None
 
         # Return the value of the session cookie
-        return request.cookies.get(session_name)
+        return request.cookies.get(self.session_name)
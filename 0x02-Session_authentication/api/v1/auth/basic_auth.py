@@ -6,17 +6,34 @@ and retrieve user objects based on credentials.
 """
 
 import base64
+import hashlib
+import hmac
+import os
 from typing import TypeVar, Tuple
+from api.v1.auth.auth import Auth
+from api.v1.auth.ttl_cache import TTLCache
 from models.user import User
 
 
-class BasicAuth:
+class BasicAuth(Auth):
     """
     BasicAuth class for Basic Authentication.
 
     Provides methods to extract user credentials from the Authorization header,
     validate them, and retrieve the associated User instance.
+
+    Verified credentials are cached: a repeated Authorization header maps
+    straight to the User ID, skipping the decoding, the search by email
+    and the password hashing, until the entry expires or the User's email
+    or password changes or the User is removed.
     """
+    # Verified credentials: keyed hash of the Authorization header ->
+    # (User ID, email, password hash). BASIC_AUTH_CACHE_SIZE=0 disables it
+    credential_cache = TTLCache(
+        int(os.getenv("BASIC_AUTH_CACHE_SIZE", "1024")),
+        float(os.getenv("BASIC_AUTH_CACHE_TTL", "300")))
+    # Key of the cache hashes, so that raw credentials are never kept
+    _cache_secret = os.urandom(32)
 
     def authorization_header(self, request=None) -> str:
         """
@@ -32,25 +49,6 @@ class BasicAuth:
             return None
         return request.headers.get("Authorization")
 
-    def require_auth(self, path: str, excluded_paths: list) -> bool:
-        """
-        Determine if authentication is required for a given path.
-        :param path: The requested path.
-        :param excluded_paths: List of paths that don't require authentication.
-        :return: True if authentication is required, False otherwise.
-        """
-        if path is None or excluded_paths is None or not excluded_paths:
-            return True
-        # Normalize paths
-        path = path.rstrip('/')
-        for excluded_path in excluded_paths:
-            if excluded_path.endswith('*'):  # wildcard matching
-                if path.startswith(excluded_path[:-1]):
-                    return False
-            if path == excluded_path.rstrip('/'):
-                return False
-        return True
-
     def extract_base64_authorization_header(
             self, authorization_header: str
     ) -> str:
@@ -126,13 +124,13 @@ class BasicAuth:
             return None
 
         # Search for the user using the email
-        users = User.search({"email": user_email})
+        users = self.search_users({"email": user_email})
         if not users or len(users) == 0:  # No users found
             return None
 
         # Check the first user (assuming only one match for the email)
         user = users[0]
-        if not user.is_valid_password(user_pwd):  # Password does not match
+        if not self.check_password(user, user_pwd):  # Password does not match
             return None
 
         return user
@@ -146,6 +144,9 @@ class BasicAuth:
         Returns:
             User: The authenticated user instance,
             or None if authentication fails.
+
+        Raises:
+            TooManyRequests: If password attempts are throttled.
         """
         if request is None:
             return None
@@ -155,6 +156,12 @@ class BasicAuth:
         if not auth_header:
             return None
 
+        # Credentials already verified
+        cache_key = self._cache_key(auth_header)
+        user = self.cached_user(cache_key)
+        if user is not None:
+            return user
+
         # Extract and decode the Base64 part of the Authorization header
         base64_header = self.extract_base64_authorization_header(auth_header)
         if not base64_header:
@@ -169,5 +176,51 @@ class BasicAuth:
         if not user_email or not user_pwd:
             return None
 
+        # Throttle password attempts before hashing the password
+        self.throttle_login(request, user_email)
+
         # Retrieve the user object using the extracted credentials
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is None:
+            self.login_failed(request, user_email)
+            return None
+        self.credential_cache.set(
+            cache_key, (user.id, user.email, user.password))
+        return user
+
+    def _cache_key(self, authorization_header: str) -> bytes:
+        """
+        Keyed hash of an Authorization header, used as cache key.
+
+        Args:
+            authorization_header (str): The full Authorization header.
+
+        Returns:
+            bytes: The HMAC-SHA256 of the header.
+        """
+        return hmac.new(self._cache_secret,
+                        authorization_header.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def cached_user(self, cache_key: bytes) -> TypeVar('User'):
+        """
+        Retrieves the User of previously verified credentials.
+
+        Args:
+            cache_key (bytes): Cache key of the Authorization header.
+
+        Returns:
+            User: The user instance, or None if the credentials are not
+            cached or no longer valid (User removed, email or password
+            changed).
+        """
+        entry = self.credential_cache.get(cache_key)
+        if entry is None:
+            return None
+        user_id, user_email, user_pwd_hash = entry
+        user = User.get(user_id)
+        if user is None or user.email != user_email or \
+                user.password != user_pwd_hash:
+            self.credential_cache.pop(cache_key)
+            return None
+        return user
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+This module contains the RevocationList class, which keeps an
+in-process copy of the revocations of session tokens, so that checking
+a token costs dict lookups instead of session store queries.
+"""
+from api.v1.auth.session_token import now_micros
+from typing import Dict, Tuple
+import threading
+import time
+
+
+class RevocationList:
+    """
+    Revocations of session tokens, by kind (`token`: one token by its
+    ID, `user`: every token issued to a User until then) and key.
+
+    Revocations are written to the session store, where the other
+    processes sharing it (SESSION_STORE=sqlite) read them back at most
+    once every `refresh_interval` seconds: a revocation is effective at
+    once in the process making it, and within `refresh_interval` seconds
+    on the other ones. Revocations are dropped once they expire.
+    """
+    # Expired revocations are dropped at most once per purge_interval
+    purge_interval = 60.0
+
+    def __init__(self, store, refresh_interval: float = 1.0):
+        """
+        Initializes a list holding the revocations of a session store.
+
+        Args:
+            store: The session store revocations are shared through.
+            refresh_interval (float): Seconds between two reads of the
+            revocations made by other processes.
+        """
+        self.refresh_interval = refresh_interval
+        self._store = store
+        # (kind, key) -> (revocation time in microseconds, expiry time)
+        self._revoked: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        # Sequence number of the last revocation read from the store
+        self._last_seq = 0
+        self._next_refresh = 0.0
+        self._next_purge = 0.0
+        self._lock = threading.Lock()
+
+    def revoke(self, kind: str, key: str, expires_at: float = None) -> int:
+        """
+        Records a revocation.
+
+        Args:
+            kind (str): Kind of the key.
+            key (str): What is revoked.
+            expires_at (float): Time after which the revocation can be
+            forgotten (None: never).
+
+        Returns:
+            int: Time of the revocation in microseconds since the epoch.
+        """
+        revoked_at = now_micros()
+        with self._lock:
+            self._revoked[(kind, key)] = (revoked_at, expires_at)
+        self._store.add_revocation(kind, key, revoked_at, expires_at)
+        return revoked_at
+
+    def revoked_at(self, kind: str, key: str) -> int:
+        """
+        Retrieves the time of a revocation.
+
+        Args:
+            kind (str): Kind of the key.
+            key (str): What may be revoked.
+
+        Returns:
+            int: Time of the revocation in microseconds since the epoch,
+            or None if the key isn't revoked.
+        """
+        now = time.monotonic()
+        if now >= self._next_refresh:
+            self._refresh(now)
+        entry = self._revoked.get((kind, key))
+        return None if entry is None else entry[0]
+
+    def _refresh(self, now: float):
+        """ Reads the revocations added to the store since the last read,
+        and drops the expired ones; skipped if another thread is at it """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_refresh = now + self.refresh_interval
+            for seq, kind, key, revoked_at, expires_at in \
+                    self._store.revocations(self._last_seq):
+                old = self._revoked.get((kind, key))
+                if old is None or old[0] < revoked_at:
+                    self._revoked[(kind, key)] = (revoked_at, expires_at)
+                self._last_seq = seq
+            if now >= self._next_purge:
+                self._next_purge = now + self.purge_interval
+                wall_time = time.time()
+                for k, v in list(self._revoked.items()):
+                    if v[1] is not None and v[1] <= wall_time:
+                        del self._revoked[k]
+        finally:
+            self._lock.release()
@@ -1,21 +1,67 @@
 #!/usr/bin/env python3
 """ Authentication class for managing sessions"""
+import os
+import time
 import uuid
 from api.v1.auth.auth import Auth
+from api.v1.auth.revocation_list import RevocationList
+from api.v1.auth.session_store import open_session_store
+from api.v1.auth.session_token import SessionTokens
 from models.user import User  # Import User model to fetch user data
 
 
 class SessionAuth(Auth):
-    """ Session authentication class."""
-    user_id_by_session_id = {}
+    """ Session authentication class.
+
+    Sessions are kept in a session store: this process's memory, or with
+    SESSION_STORE=sqlite a database shared by all worker processes.
+    With SESSION_DURATION set to a number of seconds, sessions expire that
+    long after their creation and are no longer returned.
+
+    With SESSION_TOKEN_KEYS set, sessions are stateless signed tokens
+    instead: the Session ID carries the User ID and expiry time, and
+    checking it needs no store lookup. A revocation list keeps, until
+    they expire, the tokens revoked by a logout and, for each User whose
+    sessions were all revoked, the time they were revoked at. Without a
+    SESSION_DURATION, tokens never expire and neither do revocations:
+    the list grows by one entry per logout.
+    """
+    # Session lifetime in seconds, read once at start-up (0: never expire)
+    session_duration = int(os.getenv('SESSION_DURATION', '0') or 0)
+    session_store = open_session_store(session_duration)
+    # Sessions of the in-memory store
+    user_id_by_session_id = getattr(session_store, 'user_id_by_session_id',
+                                    {})
+    # Maximum number of sessions of a User: creating one more ends the
+    # oldest (0: unlimited). Not enforced on session tokens
+    session_max_per_user = int(os.getenv('SESSION_MAX_PER_USER', '0') or 0)
+    # Signer of session tokens: comma-separated keys, the signing one
+    # first, the others still accepted (None: stored sessions)
+    _token_keys = [key for key in os.getenv(
+        'SESSION_TOKEN_KEYS', '').split(',') if key]
+    session_tokens = SessionTokens(_token_keys, session_duration) \
+        if _token_keys else None
+    # Revoked session tokens, read back from the store at most once every
+    # SESSION_REVOCATION_REFRESH seconds
+    session_revocations = RevocationList(
+        session_store, float(os.getenv('SESSION_REVOCATION_REFRESH', '1')))
 
     def create_session(self, user_id: str = None) -> str:
         """ Creates a Session ID for a user_id. """
         if user_id is None or not isinstance(user_id, str):
             return None
 
+        if self.session_tokens is not None:
+            return self.session_tokens.issue(user_id)
+
         session_id = str(uuid.uuid4())
-        self.user_id_by_session_id[session_id] = user_id
+        expires_at = None
+        if self.session_duration > 0:
+            expires_at = time.time() + self.session_duration
+        self.session_store.set(session_id, user_id, expires_at)
+        if self.session_max_per_user > 0:
+            self.session_store.delete_user_sessions(
+                user_id, self.session_max_per_user)
         return session_id
 
     def user_id_for_session_id(self, session_id: str = None) -> str:
@@ -23,19 +69,59 @@ class SessionAuth(Auth):
         if session_id is None or not isinstance(session_id, str):
             return None
 
-        # Use dictionary's get method to fetch User ID
-        return self.user_id_by_session_id.get(session_id)
+        if self.session_tokens is not None:
+            claims = self.session_tokens.verify(session_id)
+            if claims is None:
+                return None
+            user_id, issued_at, _, token_id = claims
+            if self.session_revocations.revoked_at(
+                    'token', token_id) is not None:
+                return None
+            # Both times are in microseconds
+            revoked_at = self.session_revocations.revoked_at('user', user_id)
+            if revoked_at is not None and issued_at <= revoked_at:
+                return None
+            return user_id
+
+        # Expired sessions are treated as missing by the store
+        return self.session_store.get(session_id)
+
+    def destroy_user_sessions(self, user_id: str) -> int:
+        """ Revokes all sessions of a User.
+
+        Returns the number of sessions removed; session tokens are not
+        counted: all those issued so far are revoked at once.
+        """
+        if user_id is None or not isinstance(user_id, str):
+            return 0
+
+        if self.session_tokens is None:
+            return self.session_store.delete_user_sessions(user_id)
+
+        # Tokens issued so far all expire within `duration`
+        duration = self.session_tokens.duration
+        self.session_revocations.revoke(
+            'user', user_id, time.time() + duration + 1 if duration else None)
+        return 0
+
+    def _delete_session(self, session_id: str) -> bool:
+        """ Deletes a stored session, or revokes a session token. """
+        if self.session_tokens is None:
+            return self.session_store.delete(session_id)
+
+        claims = self.session_tokens.verify(session_id)
+        if claims is None:
+            return False
+        _, _, expires_at, token_id = claims
+        self.session_revocations.revoke('token', token_id, expires_at)
+        return True
 
     def destroy_session(self, session_id: str = None) -> bool:
         """ Deletes a session based on the Session ID. """
         if session_id is None or not isinstance(session_id, str):
             return False
 
-        if session_id in self.user_id_by_session_id:
-            del self.user_id_by_session_id[session_id]
-            return True
-
-        return False
+        return self._delete_session(session_id)
 
     def current_user(self, request=None):
         """
@@ -74,5 +160,4 @@ class SessionAuth(Auth):
             return False
 
         # Delete the session ID
-        del self.user_id_by_session_id[session_id]
-        return True
+        return self._delete_session(session_id)
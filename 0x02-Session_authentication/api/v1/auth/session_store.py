@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+This module contains the session stores of SessionAuth: where the
+Session ID -> User ID mapping lives.
+
+- MemorySessionStore keeps sessions in the dicts of one process.
+- SQLiteSessionStore keeps them in a SQLite database file in WAL mode,
+  shared by every process of the host, so that a session created by one
+  worker authenticates requests on all of them.
+
+Both take an optional expiry time (seconds since the epoch) per session
+and never return an expired session. Both also index sessions by User
+ID, so that revoking or capping the sessions of one User costs the
+number of sessions of that User.
+
+Both also hold the revocations of session tokens, apart from sessions:
+a RevocationList keeps them in each process and reads back from the
+store the ones made by other processes.
+"""
+import os
+import threading
+import time
+from api.v1.auth.timer_wheel import TimerWheel
+from models.sqlite_pool import ConnectionPool
+
+
+class MemorySessionStore:
+    """
+    Session store in process memory.
+
+    Expired sessions are reclaimed by a timer wheel, advanced whenever a
+    session is added.
+    """
+
+    def __init__(self, duration: float = 0):
+        """
+        Initializes an empty store.
+
+        Args:
+            duration (float): Usual session lifetime in seconds, sizing
+            the timer wheel so that one revolution covers it.
+        """
+        self.user_id_by_session_id = {}
+        # Reverse index: User ID -> Session IDs, oldest first
+        self.session_ids_by_user_id = {}
+        # Expiry time of each session that expires
+        self.expiry_by_session_id = {}
+        self.expiry_wheel = TimerWheel(
+            512, max(1.0, duration / 512), time.time())
+        self._lock = threading.Lock()
+
+    def set(self, session_id: str, user_id: str, expires_at: float = None):
+        """
+        Adds a session.
+
+        Args:
+            session_id (str): The Session ID.
+            user_id (str): The User ID.
+            expires_at (float): Expiry time, or None if it never expires.
+        """
+        with self._lock:
+            if expires_at is not None:
+                self._expire_sessions(time.time())
+                self.expiry_by_session_id[session_id] = expires_at
+                self.expiry_wheel.schedule(session_id, expires_at)
+            else:
+                self.expiry_by_session_id.pop(session_id, None)
+            self._remove(session_id)
+            self.user_id_by_session_id[session_id] = user_id
+            self.session_ids_by_user_id.setdefault(
+                user_id, {})[session_id] = None
+
+    def _remove(self, session_id: str) -> bool:
+        """ Removes a session from the mappings and the reverse index,
+        but not from the expiry times. """
+        user_id = self.user_id_by_session_id.pop(session_id, None)
+        if user_id is None:
+            return False
+        session_ids = self.session_ids_by_user_id[user_id]
+        del session_ids[session_id]
+        if not session_ids:
+            del self.session_ids_by_user_id[user_id]
+        return True
+
+    def _expire_sessions(self, now: float):
+        """ Removes the sessions expired in the ticks elapsed since the
+        previous call. """
+        def due(session_id: str) -> bool:
+            expires_at = self.expiry_by_session_id.get(session_id)
+            return expires_at is None or expires_at <= now
+
+        for session_id in self.expiry_wheel.advance(now, due):
+            self._remove(session_id)
+            self.expiry_by_session_id.pop(session_id, None)
+
+    def get(self, session_id: str) -> str:
+        """
+        Retrieves the User ID of a session.
+
+        Args:
+            session_id (str): The Session ID.
+
+        Returns:
+            str: The User ID, or None if the session doesn't exist or is
+            expired.
+        """
+        # Sessions past their expiry time are treated as missing
+        expires_at = self.expiry_by_session_id.get(session_id)
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return self.user_id_by_session_id.get(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Removes a session.
+
+        Args:
+            session_id (str): The Session ID.
+
+        Returns:
+            bool: True if the session existed.
+        """
+        with self._lock:
+            self.expiry_by_session_id.pop(session_id, None)
+            return self._remove(session_id)
+
+    def delete_user_sessions(self, user_id: str, keep: int = 0) -> int:
+        """
+        Removes the sessions of a User but the `keep` most recent ones.
+
+        Args:
+            user_id (str): The User ID.
+            keep (int): Number of sessions to keep.
+
+        Returns:
+            int: Number of sessions removed.
+        """
+        with self._lock:
+            session_ids = list(self.session_ids_by_user_id.get(user_id, ()))
+            session_ids = session_ids[:max(len(session_ids) - keep, 0)]
+            for session_id in session_ids:
+                self.expiry_by_session_id.pop(session_id, None)
+                self._remove(session_id)
+        return len(session_ids)
+
+    def add_revocation(self, kind: str, key: str, revoked_at: int,
+                       expires_at: float = None):
+        """ Nothing to share: the RevocationList of this process is the
+        only one using the store """
+
+    def revocations(self, after: int) -> list:
+        """ No revocation is made by another process """
+        return []
+
+
+class SQLiteSessionStore:
+    """
+    Session store in a SQLite database shared by all processes.
+
+    Threads share a pool of connections. Sessions are looked up by their
+    primary key, and by User through an index on (user_id, created_at);
+    expired ones are purged through an index on the expiry time, at most
+    once per `purge_interval` seconds.
+    """
+    purge_interval = 1.0
+
+    def __init__(self, file_path: str):
+        """
+        Initializes a store on a database file, created if needed.
+
+        Args:
+            file_path (str): Path of the database file.
+        """
+        self._file_path = file_path
+        self._pool = ConnectionPool(file_path)
+        self._next_purge = 0.0
+        self._next_revocation_purge = 0.0
+        with self._pool.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT "
+                "PRIMARY KEY, user_id TEXT NOT NULL, created_at REAL "
+                "NOT NULL, expires_at REAL) WITHOUT ROWID")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_expires_at "
+                "ON sessions (expires_at)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_user_id "
+                "ON sessions (user_id, created_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS revocations (seq INTEGER "
+                "PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, key TEXT "
+                "NOT NULL, revoked_at INTEGER NOT NULL, expires_at REAL, "
+                "UNIQUE (kind, key))")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS revocations_expires_at "
+                "ON revocations (expires_at)")
+
+    def set(self, session_id: str, user_id: str, expires_at: float = None):
+        """
+        Adds a session.
+
+        Args:
+            session_id (str): The Session ID.
+            user_id (str): The User ID.
+            expires_at (float): Expiry time, or None if it never expires.
+        """
+        now = time.time()
+        with self._pool.transaction() as conn:
+            if now >= self._next_purge:
+                self._next_purge = now + self.purge_interval
+                conn.execute("DELETE FROM sessions WHERE expires_at <= ?",
+                             (now,))
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                (session_id, user_id, now, expires_at))
+
+    def get(self, session_id: str) -> str:
+        """
+        Retrieves the User ID of a session.
+
+        Args:
+            session_id (str): The Session ID.
+
+        Returns:
+            str: The User ID, or None if the session doesn't exist or is
+            expired.
+        """
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT user_id, expires_at FROM sessions "
+                "WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Removes a session.
+
+        Args:
+            session_id (str): The Session ID.
+
+        Returns:
+            bool: True if the session existed.
+        """
+        with self._pool.transaction() as conn:
+            return conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?",
+                (session_id,)).rowcount > 0
+
+    def delete_user_sessions(self, user_id: str, keep: int = 0) -> int:
+        """
+        Removes the sessions of a User but the `keep` most recent ones.
+
+        Args:
+            user_id (str): The User ID.
+            keep (int): Number of sessions to keep.
+
+        Returns:
+            int: Number of sessions removed.
+        """
+        with self._pool.transaction() as conn:
+            return conn.execute(
+                "DELETE FROM sessions WHERE user_id = ? AND session_id IN "
+                "(SELECT session_id FROM sessions WHERE user_id = ? "
+                "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (user_id, user_id, keep)).rowcount
+
+    def add_revocation(self, kind: str, key: str, revoked_at: int,
+                       expires_at: float = None):
+        """
+        Records a revocation of session tokens, replacing any previous
+        one of the same key.
+
+        Args:
+            kind (str): Kind of the key.
+            key (str): What is revoked.
+            revoked_at (int): Time of the revocation in microseconds.
+            expires_at (float): Time after which the revocation can be
+            forgotten (None: never).
+        """
+        now = time.time()
+        with self._pool.transaction() as conn:
+            if now >= self._next_revocation_purge:
+                self._next_revocation_purge = now + self.purge_interval
+                conn.execute(
+                    "DELETE FROM revocations WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "INSERT OR REPLACE INTO revocations (kind, key, revoked_at, "
+                "expires_at) VALUES (?, ?, ?, ?)",
+                (kind, key, revoked_at, expires_at))
+
+    def revocations(self, after: int) -> list:
+        """
+        Retrieves the revocations recorded after a given one.
+
+        Args:
+            after (int): Sequence number of the last revocation known.
+
+        Returns:
+            list: (sequence number, kind, key, revocation time, expiry
+            time) of each later revocation, in the order they were made.
+        """
+        with self._pool.connection() as conn:
+            return conn.execute(
+                "SELECT seq, kind, key, revoked_at, expires_at "
+                "FROM revocations WHERE seq > ? ORDER BY seq",
+                (after,)).fetchall()
+
+
+def open_session_store(duration: float = 0):
+    """
+    Session store selected by the SESSION_STORE environment variable:
+    `sqlite` for a SQLiteSessionStore on SESSION_STORE_PATH, otherwise a
+    MemorySessionStore.
+
+    Args:
+        duration (float): Usual session lifetime in seconds.
+    """
+    if os.getenv('SESSION_STORE') == 'sqlite':
+        return SQLiteSessionStore(
+            os.getenv('SESSION_STORE_PATH', '.sessions.sqlite3'))
+    return MemorySessionStore(duration)
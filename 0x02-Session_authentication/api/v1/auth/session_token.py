@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+This module contains the SessionTokens class, which issues and verifies
+stateless session tokens: the session carries its User ID and expiry
+time, signed with HMAC-SHA256, so that verifying it needs no lookup.
+
+A token reads
+`<user_id>.<issued_at>.<expires_at>.<token_id>.<key_id>.<signature>`,
+where `issued_at` is in microseconds since the epoch and `expires_at`
+in seconds, empty for a token that never expires, `token_id`
+is random, so that every token is unique and can be revoked on its own,
+and `key_id` names the key that signed it among the verification keys.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from typing import List, Tuple
+
+
+_clock_lock = threading.Lock()
+_last_micros = 0
+
+
+def now_micros() -> int:
+    """
+    Current time in microseconds since the epoch, strictly increasing
+    within the process: a token and a revocation of this process never
+    get the same time, however close they are.
+    """
+    global _last_micros
+    with _clock_lock:
+        _last_micros = max(time.time_ns() // 1000, _last_micros + 1)
+        return _last_micros
+
+
+class SessionTokens:
+    """
+    Signer and verifier of session tokens.
+
+    Tokens are signed with the first key and verified with any of the
+    keys, so that a new key can be put in front while tokens signed with
+    the previous ones stay valid until those are dropped.
+    """
+
+    def __init__(self, keys: List[str], duration: float = 0):
+        """
+        Initializes a signer.
+
+        Args:
+            keys (List[str]): Secret keys, the signing key first.
+            duration (float): Lifetime of a token in seconds (0: never
+            expires).
+        """
+        self.duration = duration
+        self._keys = {}
+        for key in keys:
+            key = key.encode('utf-8')
+            self._keys.setdefault(self._key_id(key), key)
+        self._signing_key_id = self._key_id(keys[0].encode('utf-8'))
+
+    @staticmethod
+    def _key_id(key: bytes) -> str:
+        """ Short public name of a key """
+        return hashlib.sha256(key).hexdigest()[:8]
+
+    @staticmethod
+    def _sign(key: bytes, payload: str) -> str:
+        """ Signature of a token payload """
+        digest = hmac.new(key, payload.encode('utf-8'), hashlib.sha256)
+        return base64.urlsafe_b64encode(digest.digest()).decode().rstrip('=')
+
+    def issue(self, user_id: str) -> str:
+        """
+        Creates a token for a User.
+
+        Args:
+            user_id (str): The User ID.
+
+        Returns:
+            str: The signed token.
+        """
+        issued_at = now_micros()
+        expires_at = issued_at // 1000000 + int(self.duration) \
+            if self.duration else ''
+        # URL-safe base64: never contains a `.`
+        token_id = secrets.token_urlsafe(12)
+        payload = "{}.{}.{}.{}.{}".format(user_id, issued_at, expires_at,
+                                          token_id, self._signing_key_id)
+        key = self._keys[self._signing_key_id]
+        return "{}.{}".format(payload, self._sign(key, payload))
+
+    def verify(self, token: str) -> Tuple[str, int, int, str]:
+        """
+        Checks the signature and expiry time of a token.
+
+        Args:
+            token (str): The token.
+
+        Returns:
+            Tuple[str, int, int, str]: The User ID, issue time (in
+            microseconds), expiry time (None if the token never expires)
+            and token ID, or None
+            if the token is malformed, signed with an unknown key, forged
+            or expired.
+        """
+        payload, _, signature = token.rpartition('.')
+        fields = payload.split('.')
+        if len(fields) != 5:
+            return None
+        user_id, issued_at, expires_at, token_id, key_id = fields
+        key = self._keys.get(key_id)
+        if key is None:
+            return None
+        try:
+            # Bytes: comparing str raises TypeError on non-ASCII ones
+            if not hmac.compare_digest(self._sign(key, payload).encode(),
+                                       signature.encode('utf-8')):
+                return None
+        except UnicodeEncodeError:
+            return None
+        expires_at = int(expires_at) if expires_at else None
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return user_id, int(issued_at), expires_at, token_id
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+This module contains the TimerWheel class, which groups keys by deadline
+into a fixed ring of time slots so that expired keys are found without
+scanning every key.
+"""
+import math
+from typing import Callable, Hashable, List
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel.
+
+    A key scheduled at a deadline goes into the slot of the tick holding
+    that deadline, modulo the number of slots. Advancing the wheel visits
+    only the slots of the ticks elapsed since the previous advance, so
+    the cost of expiring keys is O(1) amortized per key as long as the
+    deadlines are less than one revolution ahead.
+
+    The wheel doesn't store deadlines: whoever owns the keys tells it
+    when a key is due, which also makes cancelling unnecessary.
+    """
+
+    def __init__(self, slots: int, resolution: float, now: float):
+        """
+        Initializes an empty wheel.
+
+        Args:
+            slots (int): Number of slots of the ring.
+            resolution (float): Duration of a tick in seconds.
+            now (float): Current time.
+        """
+        self.resolution = resolution
+        self._slots = [set() for _ in range(slots)]
+        # First tick not swept yet
+        self._tick = self._tick_of(now)
+
+    def _tick_of(self, deadline: float) -> int:
+        """ Tick holding a point in time """
+        return math.floor(deadline / self.resolution)
+
+    def schedule(self, key: Hashable, deadline: float):
+        """
+        Adds a key to expire at a deadline.
+
+        Args:
+            key: The key.
+            deadline (float): Point in time the key expires at.
+        """
+        tick = max(self._tick_of(deadline), self._tick)
+        self._slots[tick % len(self._slots)].add(key)
+
+    def advance(self, now: float,
+                due: Callable[[Hashable], bool]) -> List[Hashable]:
+        """
+        Moves the wheel to the current time and collects the due keys
+        of the ticks that are over.
+
+        Args:
+            now (float): Current time.
+            due (Callable): Tells whether a key of a visited slot is
+            expired (it is then removed), or still scheduled later.
+            Keys that no longer exist must be reported as due.
+
+        Returns:
+            List: Keys removed from the wheel.
+        """
+        tick = self._tick_of(now)
+        elapsed = min(tick - self._tick, len(self._slots))
+        expired = []
+        for i in range(tick - elapsed, tick):
+            slot = self._slots[i % len(self._slots)]
+            keys = [key for key in slot if due(key)]
+            slot.difference_update(keys)
+            expired.extend(keys)
+        self._tick = max(self._tick, tick)
+        return expired
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+This module contains the latency metrics of the API: histograms with
+fixed buckets, aggregated in process and rendered in the Prometheus text
+format by GET /api/v1/metrics.
+
+Timing is added by wrapping functions with `timed` at start-up, and only
+when METRICS isn't `0`: switched off, no code path is touched at all.
+"""
+from bisect import bisect_left
+from os import getenv
+from typing import Callable, Dict, List, Tuple
+import functools
+import threading
+import time
+
+
+ENABLED = getenv("METRICS", "1") != "0"
+# GET /api/v1/metrics requires authentication unless METRICS_PUBLIC=1
+PUBLIC = getenv("METRICS_PUBLIC", "0") != "0"
+# Upper bounds of the buckets in seconds, from 10 us to 10 s
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+           0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Distribution of durations over fixed buckets.
+    """
+
+    def __init__(self):
+        """ Initializes an empty histogram """
+        # Count of each bucket (the last one is +Inf), not cumulative
+        self._counts = [0] * (len(BUCKETS) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """ Adds one duration """
+        i = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += seconds
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """ Cumulative count of each bucket, and sum of the durations """
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        return counts, total
+
+
+class HistogramFamily:
+    """
+    Histograms of one metric, one per value of its label.
+    """
+
+    def __init__(self, name: str, help_text: str, label: str):
+        """
+        Initializes a metric without any histogram.
+
+        Args:
+            name (str): Name of the metric.
+            help_text (str): Description of the metric.
+            label (str): Name of the label telling histograms apart.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.histograms: Dict[str, Histogram] = {}
+
+    def labels(self, value: str) -> Histogram:
+        """ Histogram of a label value, created if needed """
+        return self.histograms.setdefault(value, Histogram())
+
+    def render(self) -> List[str]:
+        """ Lines of the metric in the Prometheus text format """
+        lines = ["# HELP {} {}".format(self.name, self.help_text),
+                 "# TYPE {} histogram".format(self.name)]
+        for value, histogram in sorted(self.histograms.items()):
+            counts, total = histogram.snapshot()
+            label = '{}="{}"'.format(self.label, value.replace('"', '\\"'))
+            for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                    self.name, label, bound, count))
+            lines.append("{}_sum{{{}}} {}".format(self.name, label, total))
+            lines.append("{}_count{{{}}} {}".format(
+                self.name, label, counts[-1]))
+        return lines
+
+
+STAGES = HistogramFamily(
+    "api_stage_duration_seconds",
+    "Time spent in each stage of the authentication of requests.",
+    "stage")
+VIEWS = HistogramFamily(
+    "api_view_duration_seconds",
+    "Time spent in each view.",
+    "view")
+
+
+def timed(func: Callable, histogram: Histogram) -> Callable:
+    """
+    Wraps a function to record the duration of each call.
+
+    Args:
+        func (Callable): The function.
+        histogram (Histogram): Where durations are recorded.
+
+    Returns:
+        Callable: The wrapped function.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    return wrapper
+
+
+def render() -> str:
+    """ All metrics in the Prometheus text format """
+    return "\n".join(STAGES.render() + VIEWS.render()) + "\n"
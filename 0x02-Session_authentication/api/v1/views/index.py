@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """ Module of Index views
 """
-from flask import jsonify, abort
+from flask import jsonify, abort, Response
+from api.v1 import metrics
 from api.v1.views import app_views
 
 
@@ -26,6 +27,21 @@ def stats() -> str:
     return jsonify(stats)
 
 
+@app_views.route('/metrics', methods=['GET'], strict_slashes=False)
+def view_metrics() -> str:
+    """ GET /api/v1/metrics
+    Return:
+      - latency histograms of each authentication stage and each view,
+        in the Prometheus text format
+      - 404 if metrics are switched off (METRICS=0)
+    Requires authentication unless METRICS_PUBLIC=1
+    """
+    if not metrics.ENABLED:
+        abort(404)
+    return Response(metrics.render(),
+                    mimetype="text/plain; version=0.0.4")
+
+
 @app_views.route('/unauthorized', methods=['GET'], strict_slashes=False)
 def unauthorized() -> str:
     """ GET /api/v1/unauthorized
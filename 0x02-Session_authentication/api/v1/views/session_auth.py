@@ -4,9 +4,7 @@ Session Authentication view
 """
 from flask import jsonify, request, abort
 from api.v1.views import app_views
-from models.user import User
 from api.v1.app import auth
-import os
 
 
 @app_views.route('/auth_session/login', methods=['POST'], strict_slashes=False)
@@ -27,21 +25,27 @@ def session_auth_login():
     if not password:
         return jsonify({"error": "password missing"}), 400
 
+    # Throttle password attempts (429) before any lookup or hashing; only
+    # failed ones are counted
+    auth.throttle_login(request, email)
+
     # Retrieve user by email
     try:
-        users = User.search({"email": email})
+        users = auth.search_users({"email": email})
     except Exception as e:
         print(f"Error in User search: {e}")
         return jsonify({"error": "internal server error"}), 500
 
     if not users or len(users) == 0:
+        auth.login_failed(request, email)
         return jsonify({"error": "no user found for this email"}), 404
 
     user = users[0]
 
     # Validate password
     try:
-        if not user.is_valid_password(password):
+        if not auth.check_password(user, password):
+            auth.login_failed(request, email)
             return jsonify({"error": "wrong password"}), 401
     except Exception as e:
         print(f"Error validating password: {e}")
@@ -49,14 +53,13 @@ def session_auth_login():
 
     # Create a session ID for the user
     try:
-        from api.v1.app import auth
         session_id = auth.create_session(user.id)
     except Exception as e:
         print(f"Error creating session: {e}")
         return jsonify({"error": "internal server error"}), 500
 
     # Set the session ID in the response cookie
-    session_name = os.getenv('SESSION_NAME')
+    session_name = auth.session_name
     if not session_name:
         print("SESSION_NAME environment variable is not set.")
         return jsonify({"error": "server configuration error"}), 500
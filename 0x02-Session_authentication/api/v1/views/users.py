@@ -4,16 +4,110 @@
 from api.v1.views import app_views
 from flask import abort, jsonify, request
 from models.user import User
+from datetime import datetime, timezone
+import base64
+import binascii
+import json
+
+
+PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+PAGE_PARAMETERS = ('limit', 'cursor', 'order_by', 'order', 'since', 'until')
+
+
+def _parse_value(order_by: str, value: str):
+    """ Value of the ordering attribute from its string form
+    """
+    if order_by == 'id':
+        if not isinstance(value, str):
+            raise ValueError("IDs are strings")
+        return value
+    value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _encode_cursor(user: User, order_by: str) -> str:
+    """ Opaque cursor pointing after a User in the given ordering
+    """
+    value = getattr(user, order_by)
+    if order_by != 'id':
+        value = value.isoformat()
+    key = json.dumps([value, user.id])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def _decode_cursor(cursor: str, order_by: str) -> tuple:
+    """ (value, User ID) key a cursor points after
+    """
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(key, list):
+        raise ValueError("Cursors are lists")
+    value, user_id = key
+    return (_parse_value(order_by, value), str(user_id))
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: maximum number of User objects to return
+      - cursor: `next_cursor` of the previous page
+      - order_by: `id` (default), `created_at` or `updated_at`
+      - order: `asc` (default) or `desc`
+      - since, until: only User objects whose `order_by` value is in
+        [since, until) (ISO 8601 timestamps, or IDs)
     Return:
-      - list of all User objects JSON represented
+      - list of all User objects JSON represented, or if any parameter
+        is given, one page of them in the requested order:
+        {"users": [...], "next_cursor": <cursor of next page or null>}
+      - 400 if a parameter is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    if all(request.args.get(p) is None for p in PAGE_PARAMETERS):
+        all_users = [user.to_json() for user in User.all()]
+        return jsonify(all_users)
+
+    limit = request.args.get('limit')
+    try:
+        limit = int(limit) if limit is not None else PAGE_LIMIT
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return jsonify({'error': "Invalid limit"}), 400
+    limit = min(limit, MAX_PAGE_LIMIT)
+
+    order_by = request.args.get('order_by', 'id')
+    if order_by != 'id' and order_by not in User.ordered_attributes:
+        return jsonify({'error': "Invalid order_by"}), 400
+    order = request.args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': "Invalid order"}), 400
+
+    bounds = {}
+    for bound in ('since', 'until'):
+        value = request.args.get(bound)
+        try:
+            bounds[bound] = None if value is None \
+                else _parse_value(order_by, value)
+        except ValueError:
+            return jsonify({'error': "Invalid {}".format(bound)}), 400
+    cursor = request.args.get('cursor')
+    try:
+        after = _decode_cursor(cursor, order_by) if cursor else None
+    except (binascii.Error, ValueError, TypeError):
+        return jsonify({'error': "Invalid cursor"}), 400
+
+    users = User.query(order_by, bounds['since'], bounds['until'],
+                       order == 'desc', limit + 1, after)
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = _encode_cursor(users[-1], order_by)
+    return jsonify({
+        'users': [user.to_json() for user in users],
+        'next_cursor': next_cursor
+    })
 
 
 @app_views.route('/users/me', methods=['GET'], strict_slashes=False)
@@ -66,6 +160,9 @@ def delete_user(user_id: str = None) -> str:
     if user is None:
         abort(404)
     user.remove()
+    # Log the deleted User out everywhere
+    from api.v1.app import auth
+    auth.destroy_user_sessions(user.id)
     return jsonify({}), 200
 
 
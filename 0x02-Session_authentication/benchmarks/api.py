@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+""" HTTP benchmark: requests per second and latency of the API routes
+
+Each authentication type runs in its own process (AUTH_TYPE is read when
+the app is imported), which seeds the in-memory store with the users and
+drives the app through the Flask test client, without any network.
+
+Usage: python3 -m benchmarks.api [-o results.json] [-d seconds]
+                                 [number of users ...]
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+AUTH_TYPES = ["basic_auth", "session_auth"]
+EMAIL = "user0@hbtn.io"
+PASSWORD = "pwd0"
+
+
+def measure(call, duration: float, max_requests: int = 100000) -> dict:
+    """ Call a request function for about `duration` seconds (at least 5
+    times), return its throughput and latency percentiles
+    """
+    latencies = []
+    statuses = set()
+    start = time.perf_counter()
+    while len(latencies) < max_requests:
+        t = time.perf_counter()
+        statuses.add(call().status_code)
+        latencies.append(time.perf_counter() - t)
+        if len(latencies) >= 5 and t - start >= duration:
+            break
+    total = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / total,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1,
+                                len(latencies) * 99 // 100)] * 1000,
+        "status": sorted(statuses)
+    }
+
+
+def worker(auth_type: str, n: int, duration: float) -> list:
+    """ Benchmark the routes of an app using one authentication type on
+    n users
+    """
+    os.environ["AUTH_TYPE"] = auth_type
+    os.environ.setdefault("SESSION_NAME", "_my_session_id")
+    from api.v1.app import app
+    from benchmarks.storage import seed
+    seed(n)
+    client = app.test_client()
+
+    headers = {}
+    if auth_type == "basic_auth":
+        credentials = "{}:{}".format(EMAIL, PASSWORD).encode()
+        headers["Authorization"] = "Basic " + \
+            base64.b64encode(credentials).decode()
+    else:
+        response = client.post("/api/v1/auth_session/login",
+                               data={"email": EMAIL, "password": PASSWORD})
+        assert response.status_code == 200, response.status_code
+
+    routes = {
+        "GET /api/v1/status": lambda: client.get("/api/v1/status"),
+        "GET /api/v1/users?limit=100": lambda: client.get(
+            "/api/v1/users?limit=100", headers=headers),
+        "GET /api/v1/users": lambda: client.get(
+            "/api/v1/users", headers=headers),
+        "GET /api/v1/users/me": lambda: client.get(
+            "/api/v1/users/me", headers=headers),
+    }
+    if auth_type == "session_auth":
+        routes["POST /api/v1/auth_session/login"] = lambda: client.post(
+            "/api/v1/auth_session/login",
+            data={"email": EMAIL, "password": PASSWORD})
+    results = []
+    for route, call in routes.items():
+        result = {"auth_type": auth_type, "users": n, "route": route}
+        result.update(measure(call, duration))
+        results.append(result)
+    return results
+
+
+def git_commit(root: str) -> str:
+    """ Commit of the working tree holding root, if any
+    """
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """ Run a worker process per authentication type and number of users,
+    print a table and write all results as JSON
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("users", type=int, nargs="*",
+                        default=[1000, 100000, 1000000])
+    parser.add_argument("-o", "--output", default="benchmark_http.json",
+                        help="JSON file the results are written to")
+    parser.add_argument("-d", "--duration", type=float, default=2.0,
+                        help="seconds spent on each route")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        json.dump(worker(args.worker, args.users[0], args.duration),
+                  sys.stdout)
+        return
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    results = []
+    print("{:>12} {:>8} {:<34} {:>9} {:>9} {:>9}".format(
+        "auth", "users", "route", "req/s", "p50 (ms)", "p99 (ms)"))
+    for n in args.users:
+        for auth_type in AUTH_TYPES:
+            # Run from an empty directory: no .db_* file is read or written
+            workdir = tempfile.mkdtemp()
+            try:
+                output = subprocess.check_output(
+                    [sys.executable, "-m", "benchmarks.api", "--worker",
+                     auth_type, "-d", str(args.duration), str(n)],
+                    cwd=workdir, env=env)
+            finally:
+                shutil.rmtree(workdir)
+            for result in json.loads(output):
+                print("{:>12} {:>8} {:<34} {:>9.0f} {:>9.3f} {:>9.3f}".format(
+                    auth_type, n, result["route"], result["rps"],
+                    result["p50_ms"], result["p99_ms"]))
+                results.append(result)
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "commit": git_commit(root),
+            "python": platform.python_version(),
+            "duration": args.duration,
+            "results": results
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
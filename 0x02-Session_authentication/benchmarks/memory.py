@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+""" Memory benchmark: bytes per User in memory, regular vs compact table
+
+Usage: python3 -m benchmarks.memory [number of users ...]
+"""
+import gc
+import sys
+import tracemalloc
+from models.column_table import ColumnTable
+from models.user import User
+
+
+def bytes_per_user(n: int, compact: bool) -> float:
+    """ Traced memory of a table holding n users, divided by n
+    """
+    gc.collect()
+    tracemalloc.start()
+    table = ColumnTable(User) if compact else {}
+    for i in range(n):
+        user = User()
+        user.email = "user{}@hbtn.io".format(i)
+        user.password = "pwd{}".format(i)
+        user.first_name = "Bob" if i % 2 else "Alice"
+        user.last_name = None
+        table[user.id] = user
+        del user
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del table
+    return size / n
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100000, 1000000]
+    print("{:>10} {:>12} {:>12}".format("users", "regular", "compact"))
+    for n in sizes:
+        print("{:>10} {:>12.1f} {:>12.1f}".format(
+            n, bytes_per_user(n, False), bytes_per_user(n, True)))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" Storage benchmark: save/load time and file size per snapshot format
+
+Usage: python3 -m benchmarks.storage [number of users ...]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from models.user import User
+
+
+FORMATS = ["json", "bin", "jsonl"]
+
+
+def seed(n: int):
+    """ Fill the in-memory store with n users, without touching the disk
+    """
+    users = {}
+    for i in range(n):
+        user = User()
+        user.email = "user{}@hbtn.io".format(i)
+        user.password = "pwd{}".format(i)
+        user.first_name = "Bob"
+        users[user.id] = user
+    User.backend.replace(User, users)
+
+
+def run(n: int, storage_format: str) -> dict:
+    """ Time save_to_file() and load_from_file() of n users in a format
+    """
+    User.storage_format = storage_format
+    seed(n)
+    start = time.perf_counter()
+    User.save_to_file()
+    save_time = time.perf_counter() - start
+    size = os.path.getsize(User.backend.file_path(User))
+    start = time.perf_counter()
+    User.load_from_file()
+    load_time = time.perf_counter() - start
+    assert User.count() == n
+    return {"save": save_time, "load": load_time, "size": size}
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [10000, 100000, 1000000]
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    print("{:>10} {:>6} {:>10} {:>10} {:>12}".format(
+        "users", "format", "save (s)", "load (s)", "size (B)"))
+    try:
+        for n in sizes:
+            for storage_format in FORMATS:
+                result = run(n, storage_format)
+                print("{:>10} {:>6} {:>10.3f} {:>10.3f} {:>12}".format(
+                    n, storage_format, result["save"], result["load"],
+                    result["size"]))
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+""" Main 4: log in through the API, with session and Basic authentication
+"""
+import base64
+import os
+import uuid
+
+os.environ.setdefault("SESSION_NAME", "_my_session_id")
+os.environ.setdefault("AUTH_TYPE", "session_auth")
+# Slow refill, so that the attempts below don't earn a token back
+os.environ.setdefault("LOGIN_RATE", "0.01")
+from api.v1.app import app, auth  # noqa: E402
+from models.user import User  # noqa: E402
+
+user_email = "{}@hbtn.io".format(uuid.uuid4())
+user_clear_pwd = "H0lbertonSchool98!"
+user = User()
+user.email = user_email
+user.password = user_clear_pwd
+user.save()
+
+client = app.test_client()
+burst = int(auth.login_limiter.burst)
+
+
+def login(email: str, password: str) -> int:
+    """ Status of a login attempt """
+    if os.environ["AUTH_TYPE"] == "basic_auth":
+        credentials = "{}:{}".format(email, password).encode()
+        return client.get("/api/v1/users/me", headers={
+            "Authorization": "Basic " + base64.b64encode(
+                credentials).decode()}).status_code
+    return client.post("/api/v1/auth_session/login", data={
+        "email": email, "password": password}).status_code
+
+
+# Successful logins are never throttled
+print([login(user_email, user_clear_pwd) for _ in range(burst + 2)])
+# Failed ones are, past the burst
+print([login(user_email, "wrong") for _ in range(burst + 1)])
+# Then so are good passwords (but for the credentials Basic auth cached)
+print(login(user_email, user_clear_pwd))
@@ -3,26 +3,52 @@
 """
 from datetime import datetime
 from typing import TypeVar, List, Iterable
-from os import path
-import json
+from os import getenv
+from models.file_backend import FileBackend
+from models.sqlite_backend import SQLiteBackend
+import atexit
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
-DATA = {}
+
+
+def _backend():
+    """ Storage backend selected by DB_BACKEND
+    """
+    if getenv("DB_BACKEND") == "sqlite":
+        return SQLiteBackend(getenv("DB_SQLITE_PATH", ".db.sqlite3"))
+    return FileBackend()
 
 
 class Base():
     """ Base class
     """
+    # Attributes kept in a secondary hash index: value -> ids
+    indexed_attributes = ()
+    # Attributes query() can order by and filter on a range of (besides
+    # the ID), through an ordered index
+    ordered_attributes = ("created_at", "updated_at")
+    # Append each save/remove to .db_<Class>.journal instead of rewriting
+    # the whole file; the journal is compacted past journal_max_size bytes
+    journal = getenv("DB_JOURNAL", "0") == "1"
+    journal_max_size = int(getenv("DB_JOURNAL_MAX_SIZE", 4 * 1024 * 1024))
+    # Write-behind window in seconds: writes made within the same window
+    # reach the disk in one go. 0 writes synchronously on every save/remove
+    flush_interval = int(getenv("DB_FLUSH_INTERVAL", "0")) / 1000
+    # Snapshot format: one of SERIALIZERS ("json", "bin") or "jsonl" (one
+    # object per line, indexed by offset and loaded lazily)
+    storage_format = getenv("DB_FORMAT", "json")
+    # Keep objects column by column instead of one __dict__ each
+    compact = getenv("DB_COMPACT", "0") == "1"
+    # Storage backend (load/dump/flush/get/search/query/count/save/
+    # remove): FileBackend keeps objects in the memory of each process,
+    # persisted to files; SQLiteBackend shares them between processes
+    backend = _backend()
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
-        s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
-
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
             self.created_at = datetime.strptime(kwargs.get('created_at'),
@@ -59,54 +85,39 @@ class Base():
 
     @classmethod
     def load_from_file(cls):
-        """ Load all objects from file
+        """ Load all objects from the backend's storage
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        cls.backend.load(cls)
 
     @classmethod
     def save_to_file(cls):
-        """ Save all objects to file
+        """ Save all objects to the backend's storage
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        cls.backend.dump(cls)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def flush(cls):
+        """ Write pending changes of this class (and its subclasses)
+        to disk
+        """
+        cls.backend.flush(cls)
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self.__class__.backend.save(self)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        self.__class__.backend.remove(self)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return cls.backend.count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,20 +129,29 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return cls.backend.get(cls, id)
+
+    @classmethod
+    def query(cls, order_by: str = "id", since=None, until=None,
+              reverse: bool = False, limit: int = None,
+              after: tuple = None) -> List[TypeVar('Base')]:
+        """ Return objects ordered by the ID or one of the
+        ordered_attributes (ties broken by ID)
+
+        Only objects whose value is in [since, until) are returned, at
+        most `limit` of them, resuming after the (value, ID) key `after`
+        of the last object of the previous page.
+        """
+        if order_by != "id" and order_by not in cls.ordered_attributes:
+            raise ValueError("Can't order by {}".format(order_by))
+        return cls.backend.query(cls, order_by, since, until, reverse,
+                                 limit, after)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
-        s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+        return cls.backend.search(cls, attributes)
+
+
+atexit.register(Base.flush)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+""" Column table module
+
+Compact in-memory representation of the objects of a class: one column
+per attribute instead of one `__dict__` per object. Datetime attributes
+are stored as microseconds since the epoch in an `array`; strings of
+low-cardinality columns are deduplicated through a per-column pool.
+Objects are only built when accessed, and kept alive by a weak cache as
+long as the caller holds them. Rows move on removal, so reads and writes
+go through one lock.
+"""
+from array import array
+from datetime import datetime, timedelta
+from typing import Iterator, Tuple, TypeVar
+import threading
+import weakref
+
+
+EPOCH = datetime(1970, 1, 1)
+# Distinct strings pooled per column before it's deemed high-cardinality
+POOL_SIZE = 4096
+# Marks an attribute the object doesn't have
+_MISSING = object()
+
+
+def to_micros(value: datetime) -> int:
+    """ Datetime -> microseconds since the epoch
+    """
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def from_micros(value: int) -> datetime:
+    """ Microseconds since the epoch -> datetime
+    """
+    return EPOCH + timedelta(microseconds=value)
+
+
+class ColumnTable():
+    """ Mapping of ID -> object storing objects column by column
+    """
+
+    def __init__(self, cls: type):
+        """ Initialize an empty table of `cls` objects
+        """
+        self._cls = cls
+        self._rows = {}
+        self._ids = []
+        self._columns = {}
+        self._pools = {}
+        self._cache = weakref.WeakValueDictionary()
+        self._lock = threading.RLock()
+
+    def _new_column(self, value) -> list:
+        """ Column suited to store a first value (after `len(ids)` rows)
+        """
+        if type(value) is datetime:
+            return array('q', bytes(8 * len(self._ids)))
+        return [_MISSING] * len(self._ids)
+
+    def _store(self, row: int, name: str, value):
+        """ Store one attribute value in its column
+        """
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = self._new_column(value)
+        if type(column) is array:
+            if type(value) is datetime:
+                column[row] = to_micros(value)
+                return
+            # Not a datetime anymore: fall back to a list of values
+            column = self._columns[name] = [from_micros(v) for v in column]
+        if type(value) is str:
+            value = self._pooled(name, value)
+        column[row] = value
+
+    def _pooled(self, name: str, value: str) -> str:
+        """ Shared copy of a string value of a low-cardinality column
+        """
+        pool = self._pools.setdefault(name, {})
+        if pool is None:
+            return value
+        pooled = pool.setdefault(value, value)
+        if len(pool) > POOL_SIZE:
+            # Mostly distinct values (emails, hashes): pooling only costs
+            self._pools[name] = None
+        return pooled
+
+    def _build(self, row: int) -> TypeVar('Base'):
+        """ Build the object stored in a row, without calling __init__
+        """
+        obj = self._cls.__new__(self._cls)
+        attrs = obj.__dict__
+        for name, column in self._columns.items():
+            value = column[row]
+            if type(column) is array:
+                attrs[name] = from_micros(value)
+            elif value is not _MISSING:
+                attrs[name] = value
+        return obj
+
+    def get(self, obj_id: str, default=None) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        with self._lock:
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                return obj
+            row = self._rows.get(obj_id)
+            if row is None:
+                return default
+            obj = self._build(row)
+            self._cache[obj_id] = obj
+            return obj
+
+    def __getitem__(self, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        obj = self.get(obj_id)
+        if obj is None:
+            raise KeyError(obj_id)
+        return obj
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ True if an object exists with this ID
+        """
+        return obj_id in self._rows
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return len(self._ids)
+
+    def __setitem__(self, obj_id: str, obj: TypeVar('Base')):
+        """ Add or replace an object, copying its attributes in columns
+        """
+        with self._lock:
+            row = self._rows.get(obj_id)
+            if row is None:
+                row = len(self._ids)
+                self._ids.append(obj_id)
+                for column in self._columns.values():
+                    column.append(0 if type(column) is array else _MISSING)
+                self._rows[obj_id] = row
+            attrs = obj.__dict__
+            for name, column in self._columns.items():
+                if name not in attrs:
+                    if type(column) is array:
+                        self._columns[name] = column = \
+                            [from_micros(v) for v in column]
+                    column[row] = _MISSING
+            for name, value in attrs.items():
+                self._store(row, name, value)
+            self._cache[obj_id] = obj
+
+    def __delitem__(self, obj_id: str):
+        """ Remove an object: the last row moves into its place
+        """
+        with self._lock:
+            row = self._rows.pop(obj_id)
+            last = len(self._ids) - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+                for column in self._columns.values():
+                    column[row] = column[last]
+            self._ids.pop()
+            for column in self._columns.values():
+                column.pop()
+            self._cache.pop(obj_id, None)
+
+    def pop(self, obj_id: str, default=None) -> TypeVar('Base'):
+        """ Remove an object and return it
+        """
+        obj = self.get(obj_id)
+        if obj is None:
+            return default
+        del self[obj_id]
+        return obj
+
+    def keys(self) -> Iterator[str]:
+        """ Every ID
+        """
+        return iter(list(self._ids))
+
+    def values(self) -> Iterator[TypeVar('Base')]:
+        """ Every object
+        """
+        return (obj for _, obj in self.items())
+
+    def items(self) -> Iterator[Tuple[str, TypeVar('Base')]]:
+        """ (ID, object) of every object
+        """
+        for obj_id in list(self._ids):
+            obj = self.get(obj_id)
+            if obj is not None:
+                yield obj_id, obj
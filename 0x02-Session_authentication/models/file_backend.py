@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+""" File backend module
+
+Default storage backend: objects live in the memory of each process, in
+one table per class, and are persisted to `.db_<Class>.*` files (whole
+snapshots, optionally plus an append-only journal, written synchronously
+or by a background flusher). Searches go through secondary hash indexes
+and queries through ordered indexes, both kept in memory.
+
+How each class is stored is read from its attributes: `storage_format`,
+`compact`, `journal`, `journal_max_size` and `flush_interval`.
+"""
+from typing import Iterable, List, TypeVar
+from os import path
+from models.column_table import ColumnTable
+from models.lazy_table import LazyTable, snapshot_files, write_snapshot
+from models.serializers import SERIALIZERS
+from models.sorted_set import SortedSet
+from models.versioned_table import VersionedTable
+import json
+import os
+import threading
+import time
+
+
+class FileBackend():
+    """ Storage backend in process memory, persisted to files
+    """
+
+    def __init__(self):
+        """ Initialize a backend without any object
+        """
+        # Class name -> table of ID -> object
+        self.data = {}
+        # Secondary hash indexes: class name -> attribute -> value -> ids
+        self.indexes = {}
+        # Class name -> ID -> indexed attribute -> value, to unindex
+        self.indexed_values = {}
+        # Ordered indexes: class name -> attribute -> SortedSet of
+        # (value, id), built on the first query() ordered by the attribute
+        # and then maintained; read without locking
+        self.ordered = {}
+        # Write-behind state: class -> journal records waiting for the
+        # flusher
+        self.pending = {}
+        self._pending_lock = threading.Lock()
+        self._file_lock = threading.RLock()
+        # Serializes writers of the tables and indexes; readers don't
+        # take it
+        self._write_lock = threading.RLock()
+        self._flusher = None
+
+    @staticmethod
+    def new_table(cls: type, items: Iterable[tuple] = ()):
+        """ In-memory table of objects of a class, holding the (ID,
+        object) items given (none by default)
+        """
+        if cls.compact:
+            table = ColumnTable(cls)
+            for obj_id, obj in items:
+                table[obj_id] = obj
+            return table
+        return VersionedTable.from_items(items)
+
+    def _table(self, cls: type):
+        """ Table of the objects of a class, created if needed
+        """
+        table = self.data.get(cls.__name__)
+        if table is None:
+            table = self.data.setdefault(cls.__name__, self.new_table(cls))
+        return table
+
+    @staticmethod
+    def file_path(cls: type, storage_format: str = None) -> str:
+        """ Path of the snapshot file of a class in a given format
+        """
+        return ".db_{}.{}".format(cls.__name__,
+                                  storage_format or cls.storage_format)
+
+    def replace(self, cls: type, objs: dict):
+        """ Replace every object of a class in memory by the objects of a
+        dict of ID -> object, without touching the disk
+        """
+        s_class = cls.__name__
+        with self._write_lock:
+            self.indexes[s_class] = {}
+            self.indexed_values[s_class] = {}
+            self.ordered.pop(s_class, None)
+            for obj in objs.values():
+                self._index(cls, obj)
+            self.data[s_class] = self.new_table(cls, objs.items())
+
+    def load(self, cls: type):
+        """ Load all objects of a class from file, then replay the journal
+        over them
+
+        The snapshot is looked for in the configured format first, then
+        in the other ones. A "jsonl" snapshot is only memory-mapped:
+        objects are built on first access.
+        """
+        s_class = cls.__name__
+        with self._write_lock:
+            # Objects are gathered in a dict, then put in a table at once:
+            # a versioned table would copy a shard per insertion
+            objs = {}
+            self.indexes[s_class] = {}
+            self.indexed_values[s_class] = {}
+            self.ordered.pop(s_class, None)
+            formats = [cls.storage_format] + [
+                f for f in list(SERIALIZERS) + ["jsonl"]
+                if f != cls.storage_format]
+            for storage_format in formats:
+                file_path = self.file_path(cls, storage_format)
+                if not path.exists(file_path):
+                    continue
+                if storage_format == "jsonl":
+                    objs = LazyTable(cls, file_path)
+                    break
+                serializer = SERIALIZERS[storage_format]
+                mode = 'rb' if serializer.binary else 'r'
+                with open(file_path, mode) as f:
+                    for obj in serializer.load(f, cls):
+                        objs[obj.id] = obj
+                        self._index(cls, obj)
+                break
+
+            journal_path = ".db_{}.journal".format(s_class)
+            if path.exists(journal_path):
+                with open(journal_path, 'r') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # Torn last record of an interrupted append
+                            break
+                        if record["op"] == "save":
+                            obj = cls(**record["obj"])
+                            objs[record["id"]] = obj
+                            self._index(cls, obj)
+                        else:
+                            objs.pop(record["id"], None)
+                            self._unindex(cls, record["id"])
+            if not isinstance(objs, LazyTable):
+                objs = self.new_table(cls, objs.items())
+            self.data[s_class] = objs
+
+    def dump(self, cls: type):
+        """ Save all objects of a class to file
+
+        The snapshot replaces the previous one atomically and supersedes
+        the journal, which is dropped.
+        """
+        s_class = cls.__name__
+        with self._file_lock:
+            objs = self._table(cls)
+            file_path = self.file_path(cls)
+            if cls.storage_format == "jsonl":
+                if isinstance(objs, LazyTable):
+                    version = objs.version
+                    items = objs.json_items()
+                else:
+                    items = ((obj_id, obj.to_json(True))
+                             for obj_id, obj in list(objs.items()))
+                write_snapshot(file_path, items, cls.indexed_attributes)
+            else:
+                serializer = SERIALIZERS[cls.storage_format]
+                tmp_path = "{}.tmp".format(file_path)
+                with open(tmp_path, 'wb' if serializer.binary else 'w') as f:
+                    serializer.dump(f, list(objs.values()))
+                os.replace(tmp_path, file_path)
+
+            stale_files = [self.file_path(cls, f) for f in SERIALIZERS
+                           if f != cls.storage_format]
+            if cls.storage_format != "jsonl":
+                stale_files += snapshot_files(
+                    self.file_path(cls, "jsonl"), cls.indexed_attributes)
+            stale_files.append(".db_{}.journal".format(s_class))
+            for stale_file in stale_files:
+                if path.exists(stale_file):
+                    os.remove(stale_file)
+
+            if isinstance(objs, LazyTable) and cls.storage_format == "jsonl":
+                # Map the new snapshot so the in-memory overlay is released
+                objs.reopen(version)
+
+    def _append_to_journal(self, cls: type, records: List[dict]):
+        """ Append save/remove records to the journal, compacting it
+        into a new snapshot once it grows past journal_max_size
+        """
+        journal_path = ".db_{}.journal".format(cls.__name__)
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        with self._file_lock:
+            with open(journal_path, 'a') as f:
+                f.write(lines)
+                size = f.tell()
+            if size > cls.journal_max_size:
+                self.dump(cls)
+
+    def _write(self, cls: type, records: List[dict]):
+        """ Persist a batch of save/remove records
+        """
+        if cls.journal:
+            self._append_to_journal(cls, records)
+        else:
+            self.dump(cls)
+
+    def _persist(self, cls: type, record: dict):
+        """ Persist one save/remove record now, or queue it for the
+        background flusher when write-behind is enabled
+        """
+        if cls.flush_interval <= 0:
+            self._write(cls, [record])
+            return
+        with self._pending_lock:
+            records = self.pending.setdefault(cls, [])
+            if cls.journal:
+                records.append(record)
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, args=(cls.flush_interval,),
+                    daemon=True)
+                self._flusher.start()
+
+    def flush(self, cls: type = object):
+        """ Write pending changes of a class (and its subclasses) to disk
+        """
+        with self._file_lock:
+            with self._pending_lock:
+                klasses = [k for k in self.pending if issubclass(k, cls)]
+                batches = [(k, self.pending.pop(k)) for k in klasses]
+            for klass, records in batches:
+                self._write(klass, records)
+
+    def _flush_loop(self, interval: float):
+        """ Background flusher: group-commit pending writes every interval
+        """
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or replace an object
+        """
+        cls = obj.__class__
+        with self._write_lock:
+            self._table(cls)[obj.id] = obj
+            self._index(cls, obj)
+            self._persist(cls, {"op": "save", "id": obj.id,
+                                "obj": obj.to_json(True)})
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Remove an object
+        """
+        cls = obj.__class__
+        with self._write_lock:
+            objs = self._table(cls)
+            if objs.get(obj.id) is not None:
+                del objs[obj.id]
+                self._unindex(cls, obj.id)
+                self._persist(cls, {"op": "remove", "id": obj.id})
+
+    def _index(self, cls: type, obj: TypeVar('Base')):
+        """ Add (or refresh) the index entries of an object
+        """
+        self._unindex(cls, obj.id)
+        s_class = cls.__name__
+        values = {}
+        for attr, keys in self.ordered.get(s_class, {}).items():
+            value = getattr(obj, attr, None)
+            if value is not None:
+                keys.add((value, obj.id))
+                values[attr] = value
+        indexes = self.indexes.setdefault(s_class, {})
+        for attr in cls.indexed_attributes:
+            value = getattr(obj, attr, None)
+            try:
+                ids = indexes.setdefault(attr, {}).setdefault(value, {})
+            except TypeError:
+                # Unhashable value: search() falls back to a scan
+                continue
+            ids[obj.id] = None
+            values[attr] = value
+        self.indexed_values.setdefault(s_class, {})[obj.id] = values
+
+    def _unindex(self, cls: type, obj_id: str):
+        """ Drop the index entries of an object
+        """
+        s_class = cls.__name__
+        values = self.indexed_values.get(s_class, {}).pop(obj_id, None)
+        if values is None:
+            return
+        indexes = self.indexes.get(s_class, {})
+        ordered = self.ordered.get(s_class, {})
+        for attr, value in values.items():
+            if attr in ordered:
+                ordered[attr].discard((value, obj_id))
+            ids = indexes[attr].get(value) if attr in indexes else None
+            if ids is None:
+                continue
+            ids.pop(obj_id, None)
+            if len(ids) == 0:
+                del indexes[attr][value]
+
+    def count(self, cls: type) -> int:
+        """ Count all objects
+        """
+        return len(self._table(cls))
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        return self._table(cls).get(obj_id)
+
+    def query(self, cls: type, order_by: str = "id", since=None,
+              until=None, reverse: bool = False, limit: int = None,
+              after: tuple = None) -> List[TypeVar('Base')]:
+        """ Return objects ordered by the ID or one of the
+        ordered_attributes (ties broken by ID), with the value in
+        [since, until), resuming after the (value, ID) key `after`
+
+        Costs a binary search plus the size of the result.
+        """
+        minimum = None if since is None else (since, "")
+        maximum = None if until is None else (until, "")
+        inclusive = [True, False]
+        if after is not None and not reverse and \
+                (minimum is None or after >= minimum):
+            minimum = after
+            inclusive[0] = False
+        if after is not None and reverse and \
+                (maximum is None or after < maximum):
+            maximum = after
+
+        s_class = cls.__name__
+        objs = self._table(cls)
+        if isinstance(objs, VersionedTable):
+            objs = objs.snapshot()
+        keys = self.ordered.get(s_class, {}).get(order_by)
+        if keys is None:
+            with self._write_lock:
+                keys = self.ordered.setdefault(s_class, {}).get(order_by)
+                if keys is None:
+                    keys = self._build_ordered_index(cls, order_by)
+        # Ordered indexes are copy-on-write: the walk runs over the
+        # version current when it starts, without holding writers off.
+        # An entry whose object changed since is skipped
+        result = []
+        for value, obj_id in keys.irange(minimum, maximum,
+                                         tuple(inclusive), reverse):
+            if limit is not None and len(result) == limit:
+                break
+            obj = objs.get(obj_id)
+            if obj is not None and getattr(obj, order_by) == value:
+                result.append(obj)
+        return result
+
+    def _build_ordered_index(self, cls: type, attr: str) -> SortedSet:
+        """ Build the ordered index of an attribute over all objects
+        """
+        s_class = cls.__name__
+        indexed_values = self.indexed_values.setdefault(s_class, {})
+        keys = []
+        for obj in self._table(cls).values():
+            value = getattr(obj, attr, None)
+            if value is not None:
+                keys.append((value, obj.id))
+                indexed_values.setdefault(obj.id, {})[attr] = value
+        self.ordered[s_class][attr] = SortedSet(keys)
+        return self.ordered[s_class][attr]
+
+    def search(self, cls: type,
+               attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+
+        Uses the secondary indexes when every queried attribute is
+        indexed, scans all objects otherwise.
+        """
+        def _search(obj):
+            if len(attributes) == 0:
+                return True
+            for k, v in attributes.items():
+                if (getattr(obj, k) != v):
+                    return False
+            return True
+
+        objs = self._table(cls)
+        if isinstance(objs, VersionedTable):
+            # One consistent version for the whole search
+            objs = objs.snapshot()
+        ids = self._indexed_ids(cls, attributes)
+        if ids is None:
+            return list(filter(_search, objs.values()))
+        candidates = (objs.get(i) for i in ids)
+        return list(filter(_search, (o for o in candidates if o is not None)))
+
+    def _indexed_ids(self, cls: type, attributes: dict) -> Iterable[str]:
+        """ Return the smallest set of candidate IDs found in the indexes,
+        or None if at least one attribute can't be answered by an index
+        """
+        indexes = self.indexes.get(cls.__name__, {})
+        objs = self._table(cls)
+        if len(attributes) == 0:
+            return None
+        candidates = None
+        for k, v in attributes.items():
+            if k not in cls.indexed_attributes:
+                return None
+            try:
+                ids = indexes.get(k, {}).get(v, {})
+            except TypeError:
+                return None
+            if isinstance(objs, LazyTable):
+                # Objects saved since load, then objects of the snapshot
+                ids = dict.fromkeys(list(ids) + objs.lookup(k, v))
+            if candidates is None or len(ids) < len(candidates):
+                candidates = ids
+        return list(candidates)
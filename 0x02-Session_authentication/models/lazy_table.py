@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+""" Lazy table module
+
+A snapshot in the line-delimited format (`.db_<Class>.jsonl`) holds one
+JSON object per line. Next to it, `.db_<Class>.jsonl.<attr>.idx` files
+map a 64-bit hash of the id (and of each indexed attribute) to the offset
+of the line, sorted by hash so a lookup is a binary search on the
+memory-mapped file. Objects are only built when they are first accessed.
+"""
+from typing import Iterable, Iterator, List, Tuple, TypeVar
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+
+# Index files: data file size, then (key hash, line offset) records
+HEADER = struct.Struct(">Q")
+RECORD = struct.Struct(">QQ")
+
+
+def index_key(value) -> int:
+    """ 64-bit hash of a JSON value, as stored in index files
+    """
+    digest = hashlib.blake2b(json.dumps(value).encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+def index_path(file_path: str, attr: str) -> str:
+    """ Path of the index file of an attribute
+    """
+    return "{}.{}.idx".format(file_path, attr)
+
+
+def snapshot_files(file_path: str, attributes: Iterable[str]) -> List[str]:
+    """ All files making up a line-delimited snapshot
+    """
+    return [file_path] + [index_path(file_path, attr)
+                          for attr in ("id",) + tuple(attributes)]
+
+
+def _map_file(file_path: str):
+    """ Memory-map a file read-only (empty files can't be mapped)
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_indexes(file_path: str, size: int, records: dict):
+    """ Write sorted index files for a data file of the given size
+    """
+    for attr, attr_records in records.items():
+        attr_records.sort()
+        idx_path = index_path(file_path, attr)
+        tmp_path = "{}.tmp".format(idx_path)
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(size))
+            for record in attr_records:
+                f.write(RECORD.pack(*record))
+        os.replace(tmp_path, idx_path)
+
+
+def write_snapshot(file_path: str, items: Iterable[Tuple[str, dict]],
+                   attributes: Iterable[str]):
+    """ Write a line-delimited snapshot and its index files
+
+    Index files are replaced before the data file: each one records the
+    size of the data file it describes, so a crash in between is detected
+    at load time and the indexes rebuilt.
+    """
+    attributes = tuple(attributes)
+    records = {attr: [] for attr in ("id",) + attributes}
+    offset = 0
+    tmp_path = "{}.tmp".format(file_path)
+    with open(tmp_path, 'wb') as f:
+        for obj_id, obj_json in items:
+            line = json.dumps(obj_json).encode() + b"\n"
+            records["id"].append((index_key(obj_id), offset))
+            for attr in attributes:
+                records[attr].append((index_key(obj_json.get(attr)), offset))
+            f.write(line)
+            offset += len(line)
+    _write_indexes(file_path, offset, records)
+    os.replace(tmp_path, file_path)
+
+
+def rebuild_indexes(file_path: str, attributes: Iterable[str]):
+    """ Rebuild the index files of a data file by scanning it
+    """
+    attributes = tuple(attributes)
+    records = {attr: [] for attr in ("id",) + attributes}
+    offset = 0
+    with open(file_path, 'rb') as f:
+        for line in f:
+            obj_json = json.loads(line)
+            records["id"].append((index_key(obj_json["id"]), offset))
+            for attr in attributes:
+                records[attr].append((index_key(obj_json.get(attr)), offset))
+            offset += len(line)
+    _write_indexes(file_path, offset, records)
+
+
+class _Index():
+    """ Memory-mapped index file, usable as a sorted sequence of keys
+    """
+
+    def __init__(self, buf):
+        """ Initialize an index over a mapped index file
+        """
+        self._buf = buf
+        self._len = (len(buf) - HEADER.size) // RECORD.size
+
+    def __len__(self) -> int:
+        """ Number of records
+        """
+        return self._len
+
+    def __getitem__(self, i: int) -> int:
+        """ Key of the i-th record
+        """
+        return RECORD.unpack_from(self._buf, HEADER.size + i * RECORD.size)[0]
+
+    def offsets(self, value) -> List[int]:
+        """ Line offsets of all records whose key matches a value
+        """
+        key = index_key(value)
+        i = bisect.bisect_left(self, key)
+        result = []
+        while i < self._len:
+            k, offset = RECORD.unpack_from(
+                self._buf, HEADER.size + i * RECORD.size)
+            if k != key:
+                break
+            result.append(offset)
+            i += 1
+        return result
+
+
+class LazyTable():
+    """ Mapping of ID -> object backed by a line-delimited snapshot
+
+    Objects read from the snapshot are cached on first `get()`; objects
+    saved or removed since the snapshot was loaded live in memory on top
+    of it. The overlay is guarded by a lock.
+    """
+
+    def __init__(self, cls: type, file_path: str):
+        """ Initialize a lazy table of `cls` objects
+        """
+        self._cls = cls
+        self._file_path = file_path
+        self._cache = {}
+        self._lock = threading.RLock()
+        self._open()
+
+    def _open(self):
+        """ Map the snapshot and its indexes, dropping the in-memory
+        overlay (the snapshot is expected to contain it)
+        """
+        attributes = ("id",) + tuple(self._cls.indexed_attributes)
+        data = _map_file(self._file_path)
+        indexes = {}
+        for attr in attributes:
+            idx_path = index_path(self._file_path, attr)
+            buf = _map_file(idx_path) if os.path.exists(idx_path) else b""
+            if len(buf) < HEADER.size or \
+                    HEADER.unpack_from(buf)[0] != len(data):
+                rebuild_indexes(self._file_path, attributes[1:])
+                return self._open()
+            indexes[attr] = _Index(buf)
+        self._data = data
+        self._indexes = indexes
+        self._removed = set()
+        self._added = {}
+        self._len = len(indexes["id"])
+        self._version = 0
+
+    def reopen(self, version: int):
+        """ Switch to the snapshot just written, if nothing changed since
+        `version`; cached objects are kept
+        """
+        with self._lock:
+            if version == self._version:
+                self._open()
+
+    @property
+    def version(self) -> int:
+        """ Counter of changes made on top of the snapshot
+        """
+        return self._version
+
+    def _line(self, offset: int) -> dict:
+        """ Parse the line starting at offset
+        """
+        end = self._data.find(b"\n", offset)
+        return json.loads(self._data[offset:end])
+
+    def _find(self, obj_id: str) -> dict:
+        """ JSON of an object in the snapshot, None if not there
+        """
+        for offset in self._indexes["id"].offsets(obj_id):
+            obj_json = self._line(offset)
+            if obj_json["id"] == obj_id:
+                return obj_json
+        return None
+
+    def _lines(self) -> Iterator[dict]:
+        """ JSON of every object in the snapshot, in file order
+        """
+        data = self._data
+        offset = 0
+        size = len(data)
+        while offset < size:
+            end = data.find(b"\n", offset)
+            yield json.loads(data[offset:end])
+            offset = end + 1
+
+    def get(self, obj_id: str, default=None) -> TypeVar('Base'):
+        """ Return one object by ID, materializing and caching it
+        """
+        with self._lock:
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                return obj
+            if obj_id in self._removed or obj_id in self._added:
+                return default
+            obj_json = self._find(obj_id)
+            if obj_json is None:
+                return default
+            obj = self._cls(**obj_json)
+            return self._cache.setdefault(obj_id, obj)
+
+    def __getitem__(self, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        obj = self.get(obj_id)
+        if obj is None:
+            raise KeyError(obj_id)
+        return obj
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ True if an object exists with this ID
+        """
+        return self.get(obj_id) is not None
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return self._len
+
+    def __setitem__(self, obj_id: str, obj: TypeVar('Base')):
+        """ Add or replace an object
+        """
+        with self._lock:
+            if obj_id not in self:
+                self._len += 1
+                if obj_id in self._removed:
+                    self._removed.discard(obj_id)
+                elif self._find(obj_id) is None:
+                    self._added[obj_id] = None
+            self._cache[obj_id] = obj
+            self._version += 1
+
+    def __delitem__(self, obj_id: str):
+        """ Remove an object
+        """
+        with self._lock:
+            if obj_id not in self:
+                raise KeyError(obj_id)
+            del self._cache[obj_id]
+            if obj_id in self._added:
+                del self._added[obj_id]
+            else:
+                self._removed.add(obj_id)
+            self._len -= 1
+            self._version += 1
+
+    def pop(self, obj_id: str, default=None) -> TypeVar('Base'):
+        """ Remove an object and return it
+        """
+        obj = self.get(obj_id)
+        if obj is None:
+            return default
+        del self[obj_id]
+        return obj
+
+    def lookup(self, attr: str, value) -> List[str]:
+        """ IDs of the snapshot objects whose indexed attribute had this
+        value when the snapshot was written
+        """
+        with self._lock:
+            ids = []
+            for offset in self._indexes[attr].offsets(value):
+                obj_json = self._line(offset)
+                obj_id = obj_json["id"]
+                if obj_json.get(attr) == value and obj_id not in self._removed:
+                    if obj_id not in self._cache:
+                        self._cache.setdefault(obj_id, self._cls(**obj_json))
+                    ids.append(obj_id)
+            return ids
+
+    def json_items(self) -> Iterator[Tuple[str, dict]]:
+        """ (ID, JSON) of every object; snapshot objects that were never
+        accessed are not materialized
+        """
+        for obj_json in self._lines():
+            obj_id = obj_json["id"]
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                yield obj_id, obj.to_json(True)
+            elif obj_id not in self._removed:
+                yield obj_id, obj_json
+        for obj_id in list(self._added):
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                yield obj_id, obj.to_json(True)
+
+    def items(self) -> Iterator[Tuple[str, TypeVar('Base')]]:
+        """ (ID, object) of every object; snapshot objects that were never
+        accessed are built for the iteration only
+        """
+        for obj_json in self._lines():
+            obj_id = obj_json["id"]
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                yield obj_id, obj
+            elif obj_id not in self._removed:
+                yield obj_id, self._cls(**obj_json)
+        for obj_id in list(self._added):
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                yield obj_id, obj
+
+    def keys(self) -> Iterator[str]:
+        """ Every ID
+        """
+        return (obj_id for obj_id, _ in self.json_items())
+
+    def values(self) -> Iterator[TypeVar('Base')]:
+        """ Every object
+        """
+        return (obj for _, obj in self.items())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+""" Serializers module
+
+Whole-file snapshot formats of `.db_<Class>.<extension>`, selected by
+the `DB_FORMAT` environment variable when saving and by the extension of
+the existing file when loading.
+"""
+from datetime import datetime
+from models.column_table import from_micros, to_micros
+from typing import IO, Iterable, Iterator, TypeVar
+import json
+import struct
+
+
+class JsonSerializer():
+    """ One JSON document mapping ID -> object JSON
+    """
+    extension = "json"
+    binary = False
+
+    def dump(self, f: IO, objs: Iterable[TypeVar('Base')]):
+        """ Write objects to a file
+        """
+        json.dump({obj.id: obj.to_json(True) for obj in objs}, f)
+
+    def load(self, f: IO, cls: type) -> Iterator[TypeVar('Base')]:
+        """ Read objects of class `cls` from a file
+        """
+        for obj_json in json.load(f).values():
+            yield cls(**obj_json)
+
+
+class BinarySerializer():
+    """ Compact binary format, stdlib only
+
+    After a magic header, each object is a record: the ID of its shape
+    (the tuple of its attribute names, defined inline on first use), then
+    one tagged value per attribute. Datetimes are stored as integer
+    microseconds since the epoch, so loading needs no `strptime`.
+    """
+    extension = "bin"
+    binary = True
+    magic = b"HBDB\x01"
+
+    _u16 = struct.Struct("<H")
+    _u32 = struct.Struct("<I")
+    _i64 = struct.Struct("<q")
+    _f64 = struct.Struct("<d")
+
+    def _dump_str(self, out: list, value: str):
+        """ Append a length-prefixed UTF-8 string
+        """
+        data = value.encode("utf-8")
+        out.append(self._u32.pack(len(data)))
+        out.append(data)
+
+    def dump(self, f: IO, objs: Iterable[TypeVar('Base')]):
+        """ Write objects to a file
+        """
+        shapes = {}
+        f.write(self.magic)
+        for obj in objs:
+            attrs = obj.__dict__
+            shape = tuple(attrs)
+            out = []
+            shape_id = shapes.get(shape)
+            if shape_id is None:
+                shape_id = shapes[shape] = len(shapes)
+                out.append(self._u16.pack(shape_id))
+                out.append(self._u16.pack(len(shape)))
+                for name in shape:
+                    self._dump_str(out, name)
+            else:
+                out.append(self._u16.pack(shape_id))
+            for value in attrs.values():
+                kind = type(value)
+                if value is None:
+                    out.append(b"N")
+                elif kind is str:
+                    out.append(b"S")
+                    self._dump_str(out, value)
+                elif kind is datetime:
+                    out.append(b"T")
+                    out.append(self._i64.pack(to_micros(value)))
+                elif kind is bool:
+                    out.append(b"t" if value else b"F")
+                elif kind is int:
+                    out.append(b"i")
+                    out.append(self._i64.pack(value))
+                elif kind is float:
+                    out.append(b"f")
+                    out.append(self._f64.pack(value))
+                else:
+                    out.append(b"J")
+                    self._dump_str(out, json.dumps(value))
+            f.write(b"".join(out))
+
+    def load(self, f: IO, cls: type) -> Iterator[TypeVar('Base')]:
+        """ Read objects of class `cls` from a file
+
+        Objects are rebuilt from their attributes without calling
+        `__init__`.
+        """
+        buf = f.read()
+        if buf[:len(self.magic)] != self.magic:
+            raise ValueError("Not a {} snapshot".format(self.extension))
+        u16, u32 = self._u16.unpack_from, self._u32.unpack_from
+        i64, f64 = self._i64.unpack_from, self._f64.unpack_from
+        shapes = []
+        pos = len(self.magic)
+        size = len(buf)
+        while pos < size:
+            shape_id = u16(buf, pos)[0]
+            pos += 2
+            if shape_id == len(shapes):
+                count = u16(buf, pos)[0]
+                pos += 2
+                shape = []
+                for _ in range(count):
+                    length = u32(buf, pos)[0]
+                    shape.append(buf[pos + 4:pos + 4 + length].decode())
+                    pos += 4 + length
+                shapes.append(shape)
+            obj = cls.__new__(cls)
+            attrs = obj.__dict__
+            for name in shapes[shape_id]:
+                tag = buf[pos]
+                pos += 1
+                if tag == 78:  # N
+                    attrs[name] = None
+                elif tag == 83 or tag == 74:  # S, J
+                    length = u32(buf, pos)[0]
+                    value = buf[pos + 4:pos + 4 + length].decode()
+                    attrs[name] = value if tag == 83 else json.loads(value)
+                    pos += 4 + length
+                elif tag == 84:  # T
+                    attrs[name] = from_micros(i64(buf, pos)[0])
+                    pos += 8
+                elif tag == 105:  # i
+                    attrs[name] = i64(buf, pos)[0]
+                    pos += 8
+                elif tag == 102:  # f
+                    attrs[name] = f64(buf, pos)[0]
+                    pos += 8
+                else:  # t, F
+                    attrs[name] = tag == 116
+            yield obj
+
+
+SERIALIZERS = {
+    serializer.extension: serializer
+    for serializer in (JsonSerializer(), BinarySerializer())
+}
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+""" Sorted set module
+
+Set of distinct, comparable values kept in order as a list of bounded
+sorted buckets: adding, removing and seeking cost a binary search over
+the buckets plus an insertion in one bucket, instead of shifting one big
+list.
+
+Writes are copy-on-write: they copy the bucket they touch and the list
+of buckets, then publish both at once. Readers (including iterations,
+which run over the state current when they start) never take a lock;
+writers must be serialized by the caller.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Iterator
+
+
+class SortedSet():
+    """ Ordered set of distinct values
+    """
+    # Buckets are split past twice this size
+    load = 512
+
+    def __init__(self, values: Iterable[Any] = ()):
+        """ Initialize a sorted set from any iterable
+        """
+        values = sorted(set(values))
+        lists = [values[i:i + self.load]
+                 for i in range(0, len(values), self.load)]
+        # (buckets, maximum of each bucket, number of values), replaced
+        # as a whole by each write
+        self._state = (lists, [bucket[-1] for bucket in lists], len(values))
+
+    def __len__(self) -> int:
+        """ Number of values
+        """
+        return self._state[2]
+
+    def __iter__(self) -> Iterator[Any]:
+        """ Values in ascending order
+        """
+        return self.irange()
+
+    def __contains__(self, value: Any) -> bool:
+        """ True if the value is in the set
+        """
+        lists, maxes, _ = self._state
+        i = bisect_left(maxes, value)
+        if i == len(maxes):
+            return False
+        bucket = lists[i]
+        j = bisect_left(bucket, value)
+        return j < len(bucket) and bucket[j] == value
+
+    def add(self, value: Any):
+        """ Add a value, if not already there
+        """
+        lists, maxes, length = self._state
+        if not maxes:
+            self._state = ([[value]], [value], 1)
+            return
+        i = bisect_left(maxes, value)
+        if i == len(maxes):
+            i -= 1
+            bucket = lists[i] + [value]
+        else:
+            bucket = lists[i]
+            j = bisect_left(bucket, value)
+            if j < len(bucket) and bucket[j] == value:
+                return
+            bucket = bucket[:j] + [value] + bucket[j:]
+        lists, maxes = list(lists), list(maxes)
+        if len(bucket) > 2 * self.load:
+            lists[i:i + 1] = [bucket[:self.load], bucket[self.load:]]
+            maxes[i:i + 1] = [bucket[self.load - 1], bucket[-1]]
+        else:
+            lists[i] = bucket
+            maxes[i] = bucket[-1]
+        self._state = (lists, maxes, length + 1)
+
+    def discard(self, value: Any):
+        """ Remove a value, if there
+        """
+        lists, maxes, length = self._state
+        i = bisect_left(maxes, value)
+        if i == len(maxes):
+            return
+        bucket = lists[i]
+        j = bisect_left(bucket, value)
+        if j == len(bucket) or bucket[j] != value:
+            return
+        bucket = bucket[:j] + bucket[j + 1:]
+        lists, maxes = list(lists), list(maxes)
+        if len(bucket) == 0:
+            del lists[i]
+            del maxes[i]
+        else:
+            lists[i] = bucket
+            maxes[i] = bucket[-1]
+        self._state = (lists, maxes, length - 1)
+
+    def irange(self, minimum: Any = None, maximum: Any = None,
+               inclusive: tuple = (True, True),
+               reverse: bool = False) -> Iterator[Any]:
+        """ Values between minimum and maximum (None: unbounded), in
+        ascending order or descending if reverse
+        """
+        lists, maxes, _ = self._state
+        if not reverse:
+            if minimum is None:
+                i, j = 0, 0
+            else:
+                find = bisect_left if inclusive[0] else bisect_right
+                i = find(maxes, minimum)
+                j = find(lists[i], minimum) if i < len(lists) else 0
+            while i < len(lists):
+                bucket = lists[i]
+                while j < len(bucket):
+                    value = bucket[j]
+                    if maximum is not None and (
+                            value > maximum or
+                            (value == maximum and not inclusive[1])):
+                        return
+                    yield value
+                    j += 1
+                i, j = i + 1, 0
+        else:
+            if maximum is None:
+                i = len(lists) - 1
+                j = len(lists[i]) - 1 if lists else -1
+            else:
+                find = bisect_right if inclusive[1] else bisect_left
+                i = bisect_left(maxes, maximum)
+                if i == len(lists):
+                    i = len(lists) - 1
+                    j = len(lists[i]) - 1 if lists else -1
+                else:
+                    j = find(lists[i], maximum) - 1
+            while i >= 0:
+                bucket = lists[i]
+                while j >= 0:
+                    value = bucket[j]
+                    if minimum is not None and (
+                            value < minimum or
+                            (value == minimum and not inclusive[0])):
+                        return
+                    yield value
+                    j -= 1
+                i -= 1
+                if i >= 0:
+                    j = len(lists[i]) - 1
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+""" SQLite backend module
+
+Storage backend keeping objects in one SQLite database instead of each
+process's memory: every worker process reads and writes the same store.
+Each class gets a table holding the object JSON, plus one indexed column
+per ordered and per indexed attribute. The database runs in WAL mode
+so readers don't block the writer.
+"""
+from datetime import datetime
+from models.sqlite_pool import ConnectionPool
+from typing import Iterable, List, TypeVar
+import json
+
+
+class SQLiteBackend():
+    """ Storage backend on a SQLite database file
+    """
+
+    def __init__(self, file_path: str):
+        """ Initialize a backend on a database file
+        """
+        self._file_path = file_path
+        self._pool = ConnectionPool(file_path)
+        self._tables = set()
+
+    @staticmethod
+    def _columns(cls: type) -> List[str]:
+        """ Indexed columns of the table of a class
+        """
+        columns = list(cls.ordered_attributes)
+        return columns + [a for a in cls.indexed_attributes
+                          if a not in columns and a != "id"]
+
+    def _table(self, cls: type) -> str:
+        """ Name of the table of a class, created if needed
+        """
+        table = cls.__name__
+        if table not in self._tables:
+            columns = self._columns(cls)
+            with self._pool.transaction() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS "{}" (id TEXT PRIMARY KEY, '
+                    '{}, data TEXT NOT NULL)'.format(
+                        table, ", ".join('"{}"'.format(c) for c in columns)))
+                for column in columns:
+                    conn.execute(
+                        'CREATE INDEX IF NOT EXISTS "{0}_{1}" '
+                        'ON "{0}" ("{1}")'.format(table, column))
+            self._tables.add(table)
+        return table
+
+    def _objects(self, cls: type, sql: str,
+                 params: Iterable = ()) -> List[TypeVar('Base')]:
+        """ Objects built from the `data` column returned by a query
+        """
+        with self._pool.connection() as conn:
+            rows = conn.execute(sql, tuple(params)).fetchall()
+        return [cls(**json.loads(data)) for data, in rows]
+
+    @staticmethod
+    def _value(value):
+        """ Column value of an attribute value: datetimes are stored as
+        in the object JSON
+        """
+        if type(value) is datetime:
+            return value.isoformat(timespec="seconds")
+        return value
+
+    def load(self, cls: type):
+        """ Make sure the table of a class exists
+        """
+        self._table(cls)
+
+    def dump(self, cls: type):
+        """ Nothing to do: every write is already persisted
+        """
+
+    def flush(self, cls: type = object):
+        """ Nothing to do: no write is ever pending
+        """
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        objs = self._objects(
+            cls, 'SELECT data FROM "{}" WHERE id = ?'.format(self._table(cls)),
+            (obj_id,))
+        return objs[0] if objs else None
+
+    def search(self, cls: type,
+               attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+
+        Attributes stored in a column are matched by SQLite (through
+        their index), the others in Python.
+        """
+        table = self._table(cls)
+        columns = ["id"] + self._columns(cls)
+        where, params, rest = [], [], {}
+        for k, v in attributes.items():
+            if k in columns and v is None:
+                where.append('"{}" IS NULL'.format(k))
+            elif k in columns and type(v) in (str, int, float):
+                where.append('"{}" = ?'.format(k))
+                params.append(v)
+            else:
+                rest[k] = v
+        sql = 'SELECT data FROM "{}"'.format(table)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return [obj for obj in self._objects(cls, sql, params)
+                if all(getattr(obj, k) == v for k, v in rest.items())]
+
+    def query(self, cls: type, order_by: str = "id", since=None,
+              until=None, reverse: bool = False, limit: int = None,
+              after: tuple = None) -> List[TypeVar('Base')]:
+        """ Return objects ordered by an indexed column (ties broken by
+        ID), with the column value in [since, until), resuming after the
+        (value, ID) key `after`
+        """
+        since, until = self._value(since), self._value(until)
+        if after is not None:
+            after = (self._value(after[0]), after[1])
+        where, params = [], []
+        if since is not None:
+            where.append('"{}" >= ?'.format(order_by))
+            params.append(since)
+        if until is not None:
+            where.append('"{}" < ?'.format(order_by))
+            params.append(until)
+        if after is not None:
+            where.append('("{}", id) {} (?, ?)'.format(
+                order_by, "<" if reverse else ">"))
+            params += list(after)
+        sql = 'SELECT data FROM "{}"'.format(self._table(cls))
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        direction = "DESC" if reverse else "ASC"
+        sql += ' ORDER BY "{0}" {1}, id {1} LIMIT ?'.format(
+            order_by, direction)
+        params.append(-1 if limit is None else limit)
+        return self._objects(cls, sql, params)
+
+    def count(self, cls: type) -> int:
+        """ Count all objects
+        """
+        sql = 'SELECT COUNT(*) FROM "{}"'.format(self._table(cls))
+        with self._pool.connection() as conn:
+            return conn.execute(sql).fetchone()[0]
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or replace an object
+        """
+        cls = obj.__class__
+        obj_json = obj.to_json(True)
+        columns = ["id"] + self._columns(cls) + ["data"]
+        values = [obj.id] + [obj_json.get(c) for c in columns[1:-1]] + \
+            [json.dumps(obj_json)]
+        with self._pool.transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO "{}" ({}) VALUES ({})'.format(
+                    self._table(cls),
+                    ", ".join('"{}"'.format(c) for c in columns),
+                    ", ".join("?" * len(columns))), values)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Remove an object
+        """
+        with self._pool.transaction() as conn:
+            conn.execute('DELETE FROM "{}" WHERE id = ?'.format(
+                self._table(obj.__class__)), (obj.id,))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+""" SQLite connection pool module
+
+Connections to one SQLite database in WAL mode, shared by all threads:
+a request borrows an open connection and gives it back. Connections
+per thread would be opened on every request, as the threaded server
+starts a thread for each one.
+"""
+from contextlib import contextmanager
+from typing import Iterator
+import queue
+import sqlite3
+
+
+class ConnectionPool():
+    """ Pool of connections to a SQLite database file
+    """
+
+    def __init__(self, file_path: str, size: int = 8):
+        """ Initialize an empty pool keeping up to `size` idle
+        connections; more are opened when all are busy, and closed when
+        given back to a full pool
+        """
+        self._file_path = file_path
+        self._idle = queue.LifoQueue(size)
+
+    def _connect(self) -> sqlite3.Connection:
+        """ New connection, usable from any thread (one at a time)
+        """
+        conn = sqlite3.connect(self._file_path, timeout=5,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """ Borrow a connection for reads
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """ Borrow a connection for writes, committed at the end of the
+        block (rolled back on errors)
+        """
+        with self.connection() as conn, conn:
+            yield conn
+
+    def close(self):
+        """ Close the idle connections
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
@@ -8,6 +8,7 @@ from models.base import Base
 class User(Base):
     """ User class
     """
+    indexed_attributes = ("email",)
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+""" Versioned table module
+
+Default in-memory table of the objects of a class. Objects are spread
+over a fixed number of shards; a write copies the one shard it touches
+and publishes a new immutable version of the table. Readers grab the
+current version (a single attribute read) and get a consistent view of
+it without taking any lock, however long they iterate.
+"""
+from typing import Iterable, Iterator, Tuple, TypeVar
+import threading
+
+
+class Snapshot():
+    """ Immutable version of a table
+    """
+    __slots__ = ("version", "_shards", "_len")
+
+    def __init__(self, version: int, shards: tuple, length: int):
+        """ Initialize a version from its shards
+        """
+        self.version = version
+        self._shards = shards
+        self._len = length
+
+    def get(self, obj_id: str, default=None) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        shards = self._shards
+        try:
+            return shards[hash(obj_id) % len(shards)].get(obj_id, default)
+        except TypeError:
+            return default
+
+    def __getitem__(self, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        obj = self.get(obj_id)
+        if obj is None:
+            raise KeyError(obj_id)
+        return obj
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ True if an object exists with this ID
+        """
+        return self.get(obj_id) is not None
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        """ Every ID
+        """
+        return self.keys()
+
+    def keys(self) -> Iterator[str]:
+        """ Every ID
+        """
+        for shard in self._shards:
+            yield from shard
+
+    def values(self) -> Iterator[TypeVar('Base')]:
+        """ Every object
+        """
+        for shard in self._shards:
+            yield from shard.values()
+
+    def items(self) -> Iterator[Tuple[str, TypeVar('Base')]]:
+        """ (ID, object) of every object
+        """
+        for shard in self._shards:
+            yield from shard.items()
+
+
+class VersionedTable():
+    """ Mapping of ID -> object with copy-on-write snapshots
+
+    Writers are serialized by a lock; reads (including iterations, which
+    run over the version current when they start) never block.
+    """
+    shard_count = 256
+
+    def __init__(self):
+        """ Initialize an empty table
+        """
+        self._lock = threading.Lock()
+        self._snapshot = Snapshot(
+            0, tuple({} for _ in range(self.shard_count)), 0)
+
+    @classmethod
+    def from_items(cls, items: Iterable[Tuple[str, TypeVar('Base')]]):
+        """ Table holding (ID, object) items, built shard by shard and
+        published as a single version (a later item replaces an earlier
+        one with the same ID)
+        """
+        table = cls()
+        shards = tuple({} for _ in range(cls.shard_count))
+        for obj_id, obj in items:
+            shards[hash(obj_id) % cls.shard_count][obj_id] = obj
+        table._snapshot = Snapshot(
+            1, shards, sum(len(shard) for shard in shards))
+        return table
+
+    def snapshot(self) -> Snapshot:
+        """ Current version of the table
+        """
+        return self._snapshot
+
+    def _write(self, obj_id: str, obj: TypeVar('Base')) -> TypeVar('Base'):
+        """ Publish a version where obj_id maps to obj (None: removed),
+        return the object it replaced
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            shards = snapshot._shards
+            i = hash(obj_id) % len(shards)
+            shard = dict(shards[i])
+            old = shard.pop(obj_id, None)
+            if obj is not None:
+                shard[obj_id] = obj
+            length = snapshot._len + (obj is not None) - (old is not None)
+            self._snapshot = Snapshot(snapshot.version + 1,
+                                      shards[:i] + (shard,) + shards[i + 1:],
+                                      length)
+            return old
+
+    def __setitem__(self, obj_id: str, obj: TypeVar('Base')):
+        """ Add or replace an object
+        """
+        self._write(obj_id, obj)
+
+    def __delitem__(self, obj_id: str):
+        """ Remove an object
+        """
+        if self._write(obj_id, None) is None:
+            raise KeyError(obj_id)
+
+    def pop(self, obj_id: str, default=None) -> TypeVar('Base'):
+        """ Remove an object and return it
+        """
+        old = self._write(obj_id, None)
+        return default if old is None else old
+
+    def get(self, obj_id: str, default=None) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        return self._snapshot.get(obj_id, default)
+
+    def __getitem__(self, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        return self._snapshot[obj_id]
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ True if an object exists with this ID
+        """
+        return obj_id in self._snapshot
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return len(self._snapshot)
+
+    def __iter__(self) -> Iterator[str]:
+        """ Every ID of the current version
+        """
+        return self._snapshot.keys()
+
+    def keys(self) -> Iterator[str]:
+        """ Every ID of the current version
+        """
+        return self._snapshot.keys()
+
+    def values(self) -> Iterator[TypeVar('Base')]:
+        """ Every object of the current version
+        """
+        return self._snapshot.values()
+
+    def items(self) -> Iterator[Tuple[str, TypeVar('Base')]]:
+        """ (ID, object) of every object of the current version
+        """
+        return self._snapshot.items()
@@ -5,9 +5,31 @@ Flask app to handle user registration and login.
 
 from flask import Flask, request, jsonify, abort, make_response, redirect
 from auth import Auth
+from rate_limit import TokenBucketLimiter, TooManyRequests
+import math
+import os
 
 app = Flask(__name__)
 AUTH = Auth()
+# Failed login attempts allowed per client address and per email: a burst
+# of LOGIN_BURST, then LOGIN_RATE per second (0: unlimited)
+LOGIN_LIMITER = TokenBucketLimiter(
+    float(os.getenv("LOGIN_RATE", "1")),
+    float(os.getenv("LOGIN_BURST", "10")),
+    int(os.getenv("LOGIN_LIMITER_SIZE", "10000")))
+# Failed login attempts allowed in total, shedding the load of a burst
+# from many addresses (0: unlimited)
+GLOBAL_LOGIN_LIMITER = TokenBucketLimiter(
+    float(os.getenv("LOGIN_GLOBAL_RATE", "0")),
+    float(os.getenv("LOGIN_GLOBAL_BURST", "100")), 1)
+
+
+@app.teardown_appcontext
+def teardown_db(exception=None) -> None:
+    """
+    Release the database session of the request's thread.
+    """
+    AUTH.teardown()
 
 
 @app.route("/", methods=["GET"])
@@ -54,6 +76,7 @@ def login():
 
     Returns:
         JSON response with appropriate message and sets session_id as a cookie.
+        Responds with 429 if login attempts are throttled.
     """
     email = request.form.get("email")
     password = request.form.get("password")
@@ -61,7 +84,18 @@ def login():
     if not email or not password:
         abort(401)  # Unauthorized
 
+    # Throttle login attempts before the bcrypt check; only failed ones
+    # are counted
+    keys = (("address", request.remote_addr), ("email", email.strip().lower()))
+    retry_after = LOGIN_LIMITER.check(keys)
+    if retry_after == 0:
+        retry_after = GLOBAL_LOGIN_LIMITER.check(("*",))
+    if retry_after > 0:
+        raise TooManyRequests(retry_after)
+
     if not AUTH.valid_login(email, password):
+        LOGIN_LIMITER.acquire(keys)
+        GLOBAL_LOGIN_LIMITER.acquire(("*",))
         abort(401)  # Unauthorized
 
     # Create a session for the user
@@ -99,7 +133,7 @@ def logout():
         abort(403)
 
     # Destroy the session and redirect to "/"
-    AUTH.destroy_session(user.id)
+    AUTH.destroy_session(user.id, session_id)
     return redirect("/")
 
 
@@ -128,6 +162,16 @@ def profile():
     return jsonify({"email": user.email})
 
 
+@app.errorhandler(TooManyRequests)
+def too_many_requests(error):
+    """
+    Respond to throttled login attempts with a 429 telling when to retry.
+    """
+    response = jsonify({"message": "Too many requests"})
+    response.headers["Retry-After"] = str(math.ceil(error.retry_after))
+    return response, 429
+
+
 @app.route("/reset_password", methods=["POST"])
 def reset_password():
     """
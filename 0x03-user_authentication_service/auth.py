@@ -3,12 +3,43 @@
 Auth class to handle user authentication and registration
 """
 import bcrypt
+import os
+import time
 import uuid
+from datetime import datetime, timedelta
+from typing import NamedTuple
 from db import DB
+from ttl_cache import TTLCache
 from user import User
 from sqlalchemy.exc import InvalidRequestError
 from werkzeug.security import generate_password_hash
 
+# bcrypt work factor of new password hashes (log2 of the iterations).
+# Lowering it isolates hashing cost from the rest in load tests
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Lifetime of a login session in seconds (0: never expires)
+SESSION_DURATION = int(os.getenv("SESSION_DURATION", "0"))
+# Expired sessions are purged by batches of SESSION_PURGE_BATCH rows when
+# a user logs in: a batch per login while full batches come back, then
+# at most once every SESSION_PURGE_INTERVAL seconds
+SESSION_PURGE_BATCH = int(os.getenv("SESSION_PURGE_BATCH", "1000"))
+SESSION_PURGE_INTERVAL = float(os.getenv("SESSION_PURGE_INTERVAL", "60"))
+# Session ID -> SessionUser cache in front of the sessions table.
+# Entries live SESSION_CACHE_TTL seconds at most, which also bounds how
+# long a logout made by another process goes unnoticed here
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "60"))
+
+
+class SessionUser(NamedTuple):
+    """
+    User of a login session, as returned by
+    Auth.get_user_from_session_id: only its ID and email, read without
+    loading the User (or served from the session cache).
+    """
+    id: int
+    email: str
+
 
 def _hash_password(password: str) -> bytes:
     """
@@ -20,8 +51,8 @@ def _hash_password(password: str) -> bytes:
     Returns:
         bytes: The salted hash of the password.
     """
-    # Generate a salt with a default work factor (e.g., 12)
-    salt = bcrypt.gensalt(rounds=12)
+    # Generate a salt with the configured work factor (default 12)
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     # Hash the password with the generated salt
     hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed_password
@@ -43,6 +74,12 @@ class Auth:
     def __init__(self):
         """Initialize the Auth class with an instance of DB."""
         self._db = DB()
+        self._next_purge = 0.0
+        self._session_cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+    def teardown(self) -> None:
+        """Release the database session of the current thread."""
+        self._db.remove_session()
 
     def register_user(self, email: str, password: str) -> User:
         """
@@ -105,47 +142,93 @@ class Auth:
         Returns:
             str: The new session ID, or None if the user is not found.
         """
+        # Generate a new session ID
+        session_id = _generate_uuid()
+        expires_at = None
+        if SESSION_DURATION > 0:
+            expires_at = datetime.utcnow() + \
+                timedelta(seconds=SESSION_DURATION)
         try:
-            user = self._db.find_user_by(email=email)
-            # Generate a new session ID
-            session_id = _generate_uuid()
-            # Update the user's session_id in the database
-            self._db.update_user(user.id, session_id=session_id)
-            return session_id
+            # Add the session of the user with this email, in one INSERT
+            if not self._db.add_session_by_email(session_id, email,
+                                                 expires_at):
+                return None
         except Exception:
             return None
+        self._session_cache.pop(session_id)
+        self._purge_expired_sessions()
+        return session_id
 
-    def get_user_from_session_id(self, session_id: str):
+    def _purge_expired_sessions(self) -> None:
+        """
+        Purge a batch of expired sessions, if the last purge is older
+        than SESSION_PURGE_INTERVAL seconds or didn't purge them all.
+        """
+        now = time.monotonic()
+        if SESSION_DURATION <= 0 or now < self._next_purge:
+            return
+        self._next_purge = now + SESSION_PURGE_INTERVAL
+        try:
+            count = self._db.purge_expired_sessions(SESSION_PURGE_BATCH)
+        except Exception:
+            return
+        if count >= SESSION_PURGE_BATCH:
+            # Expired sessions may be left: purge the next batch on the
+            # next login, so that purging keeps up with any login rate
+            self._next_purge = now
+
+    def get_user_from_session_id(self, session_id: str) -> SessionUser:
         """
         Find a user by their session ID.
 
+        Sessions seen recently are answered from an in-process cache,
+        without querying the database.
+
         Args:
             session_id (str): The session ID of the user.
 
         Returns:
-            User: The User object corresponding found.
+            SessionUser: The ID and email of the user, or None if the
+            session doesn't exist or is expired.
         """
         if session_id is None:
             return None
 
+        cached = self._session_cache.get(session_id)
+        if cached is not None:
+            return cached
+
         try:
-            user = self._db.find_user_by(session_id=session_id)
-            return user
+            user_id, email, expires_at = \
+                self._db.find_session_user(session_id)
         except Exception:
             return None
+        ttl = None
+        if expires_at is not None:
+            # Never serve the session from the cache past its expiry
+            ttl = (expires_at - datetime.utcnow()).total_seconds()
+        user = SessionUser(user_id, email)
+        self._session_cache.set(session_id, user, ttl)
+        return user
 
-    def destroy_session(self, user_id: int) -> None:
+    def destroy_session(self, user_id: int, session_id: str = None) -> None:
         """
-        Destroy the session of a user by setting their session ID to None.
+        Destroy one session of a user, or all of them.
 
         Args:
             user_id (int): The ID of the user.
+            session_id (str): The session to destroy, or None to destroy
+                every session of the user.
 
         Returns:
             None
         """
+        if session_id is not None:
+            self._session_cache.pop(session_id)
+        else:
+            self._session_cache.remove_if(lambda user: user.id == user_id)
         try:
-            self._db.update_user(user_id, session_id=None)
+            self._db.delete_sessions(user_id, session_id)
         except Exception:
             pass
 
@@ -162,18 +245,14 @@ class Auth:
         Raises:
             ValueError: If no user with the provided email exists.
         """
-        try:
-            # Find the user corresponding to the email
-            user = self._db.find_user_by(email=email)
-        except Exception:
-            # Raise ValueError with exact message for non-existing user
-            raise ValueError("User DNE")
-
         # Generate a UUID as the reset token
         reset_token = str(uuid.uuid4())
 
-        # Update the user's reset_token field in the database
-        self._db.update_user(user.id, reset_token=reset_token)
+        # Set the reset_token of the user with this email, in one UPDATE
+        if self._db.update_users({"email": email},
+                                 reset_token=reset_token) == 0:
+            # Raise ValueError with exact message for non-existing user
+            raise ValueError("User DNE")
 
         # Return the reset token
         return reset_token
@@ -189,21 +268,20 @@ class Auth:
         Raises:
             ValueError: If the reset token is invalid.
         """
-        # Check if a user exists with the given reset_token
+        # Check if a user exists with the given reset_token, before
+        # spending a bcrypt hash on it
         try:
-            user = self._db.find_user_by(reset_token=reset_token)
+            user_id = self._db.find_user_id_by(reset_token=reset_token)
         except Exception:
             raise ValueError("Invalid reset token")  # Invalid reset token
 
-        if not user:
-            raise ValueError("Invalid reset token")  # No user found
-
         # Hash the new password
         hashed_password = _hash_password(new_password).decode("utf-8")
 
-        # Update the user's hashed_password and reset_token fields
-        self._db.update_user(
-            user.id,
-            hashed_password=hashed_password,
-            reset_token=None
-        )
+        # Update the user's hashed_password and reset_token fields, unless
+        # the token was used meanwhile
+        if self._db.update_users(
+                {"id": user_id, "reset_token": reset_token},
+                hashed_password=hashed_password,
+                reset_token=None) == 0:
+            raise ValueError("Invalid reset token")
@@ -2,11 +2,16 @@
 """
 DB module
 """
-from sqlalchemy import create_engine
+import os
+from datetime import datetime
+from typing import Dict
+from sqlalchemy import (DateTime, String, create_engine, event, insert,
+                        literal, or_, select)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.session import Session
 from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.pool import QueuePool, StaticPool
 
 try:
     from sqlalchemy.orm.exc import NoResultFound
@@ -14,25 +19,132 @@ except ImportError:
     from sqlalchemy.exc import NoResultFound
 
 from user import Base, User
+from user_session import UserSession
+
+
+def _engine_options() -> dict:
+    """
+    Connection pool options from the environment.
+
+    DB_POOL_SIZE connections are kept open, up to DB_MAX_OVERFLOW more
+    are opened under load, a request waits DB_POOL_TIMEOUT seconds for a
+    free connection and connections are replaced after DB_POOL_RECYCLE
+    seconds (-1: never).
+
+    Returns:
+        dict: Keyword arguments of create_engine.
+    """
+    return {
+        "poolclass": QueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "-1")),
+    }
+
+
+# PRAGMA values of the tuned SQLite mode (DB_SQLITE_TUNED=1): write-ahead
+# log, fsync at checkpoints only, 256 MiB memory-mapped I/O, 64 MiB page
+# cache and 5 s of waiting on a locked database instead of failing
+TUNED_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": "268435456",
+    "cache_size": "-65536",
+    "busy_timeout": "5000",
+}
+
+
+def _sqlite_pragmas() -> Dict[str, str]:
+    """
+    SQLite PRAGMAs from the environment.
+
+    DB_SQLITE_TUNED=1 applies TUNED_PRAGMAS; each one can also be set on
+    its own (or overridden) by DB_SQLITE_<NAME>, e.g. DB_SQLITE_MMAP_SIZE.
+
+    Returns:
+        Dict[str, str]: Value of each PRAGMA to set on new connections.
+    """
+    pragmas = {}
+    if os.getenv("DB_SQLITE_TUNED") == "1":
+        pragmas.update(TUNED_PRAGMAS)
+    for name in TUNED_PRAGMAS:
+        value = os.getenv("DB_SQLITE_" + name.upper())
+        if value:
+            pragmas[name] = value
+    return pragmas
 
 
 class DB:
-    """DB class to interact with the database."""
+    """DB class to interact with the database.
 
-    def __init__(self) -> None:
-        """Initialize a new DB instance."""
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        Base.metadata.drop_all(self._engine)
+    Each thread gets its own session (and connection from the pool) on
+    first use, released by `remove_session` at the end of each request.
+
+    By default the schema is dropped and created again on start; in the
+    persistent mode (DB_PERSISTENT=1) it is only created if missing, so
+    users survive restarts.
+    """
+
+    def __init__(self, url: str = None, persistent: bool = None,
+                 pragmas: Dict[str, str] = None) -> None:
+        """
+        Initialize a new DB instance.
+
+        Args:
+            url (str): Database URL, by default DB_URL or sqlite:///a.db.
+            persistent (bool): Keep existing tables, by default
+                DB_PERSISTENT=1.
+            pragmas (Dict[str, str]): SQLite PRAGMAs set on each new
+                connection, by default from the DB_SQLITE_* variables.
+        """
+        url = url or os.getenv("DB_URL", "sqlite:///a.db")
+        options = _engine_options()
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            # Every connection would open its own empty database
+            options = {"poolclass": StaticPool}
+        if url.startswith("sqlite"):
+            # Pooled connections move between threads, one at a time
+            options["connect_args"] = {"check_same_thread": False}
+        self._engine = create_engine(url, echo=False, **options)
+        if url.startswith("sqlite"):
+            self._set_pragmas(
+                _sqlite_pragmas() if pragmas is None else pragmas)
+        if persistent is None:
+            persistent = os.getenv("DB_PERSISTENT") == "1"
+        if not persistent:
+            Base.metadata.drop_all(self._engine)
         Base.metadata.create_all(self._engine)
-        self.__session = None
+        self.__session = scoped_session(sessionmaker(bind=self._engine))
+
+    def _set_pragmas(self, pragmas: Dict[str, str]) -> None:
+        """
+        Set PRAGMAs on every connection the engine opens.
+
+        Args:
+            pragmas (Dict[str, str]): Value of each PRAGMA.
+        """
+        if not pragmas:
+            return
+
+        @event.listens_for(self._engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute("PRAGMA {} = {}".format(name, value))
+            cursor.close()
 
     @property
     def _session(self) -> Session:
-        """Memoized session object."""
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        """Session of the current thread."""
+        return self.__session()
+
+    def remove_session(self) -> None:
+        """
+        Close the session of the current thread, returning its connection
+        to the pool and dropping its identity map.
+        """
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """
@@ -82,9 +194,39 @@ class DB:
 
         return user
 
+    def find_user_id_by(self, **kwargs) -> int:
+        """
+        Finds the ID of a user by arbitrary keyword arguments, without
+        loading the user.
+
+        Args:
+            **kwargs: Arbitrary keyword arguments to filter the user.
+
+        Returns:
+            int: The ID of the first user matching the filter.
+
+        Raises:
+            NoResultFound: If no user matches the filter criteria.
+            InvalidRequestError: If invalid filter criteria are provided.
+        """
+        valid_columns = {column.name for column in User.__table__.columns}
+        invalid_columns = [key for key in kwargs if key not in valid_columns]
+
+        if invalid_columns:
+            raise InvalidRequestError(
+                f"Invalid columns: {', '.join(invalid_columns)}")
+
+        row = self._session.query(User.id).filter_by(**kwargs).first()
+
+        if row is None:
+            raise NoResultFound("No user found matching the criteria.")
+
+        return row[0]
+
     def update_user(self, user_id: int, **kwargs) -> None:
         """
-        Updates attr based on the provided user_id and keyword arguments.
+        Updates attr based on the provided user_id and keyword arguments,
+        in a single UPDATE: the user isn't loaded.
 
         Args:
             user_id (int): The ID of the user to be updated.
@@ -92,9 +234,39 @@ class DB:
 
         Raises:
             ValueError: If an invalid attribute is provided in kwargs.
+            NoResultFound: If no user has this ID.
+        """
+        if not kwargs:
+            # Nothing to update: only check that the user exists
+            self.find_user_id_by(id=user_id)
+            return
+        if self.update_users({"id": user_id}, **kwargs) == 0:
+            raise NoResultFound("No user found matching the criteria.")
+
+    def update_users(self, filters: dict, **kwargs) -> int:
         """
-        # Find the user using the provided user_id
-        user = self.find_user_by(id=user_id)
+        Updates every user matching the filters in a single UPDATE,
+        e.g. `update_users({"email": email}, reset_token=token)`. A list,
+        tuple or set filter value matches any of its items, so that many
+        users are updated at once: `update_users({"id": [1, 2]}, ...)`.
+        Empty filters are rejected rather than updating every user.
+
+        Users already loaded by the session are updated too.
+
+        Args:
+            filters (dict): Column -> value (or values) of the users.
+            **kwargs: Arbitrary keyword arguments to update user attributes.
+
+        Returns:
+            int: Number of users updated.
+
+        Raises:
+            ValueError: If an invalid attribute is provided in kwargs.
+            InvalidRequestError: If invalid filter criteria are provided,
+                or none.
+        """
+        if not filters:
+            raise InvalidRequestError("No filter: refusing to update all")
 
         # List of valid user attributes
         valid_attributes = {column.name for column in User.__table__.columns}
@@ -104,9 +276,114 @@ class DB:
             if key not in valid_attributes:
                 raise ValueError(f"Invalid attribute: {key}")
 
-        # Update user attributes with the provided kwargs
-        for key, value in kwargs.items():
-            setattr(user, key, value)
+        invalid_columns = [key for key in filters
+                           if key not in valid_attributes]
+        if invalid_columns:
+            raise InvalidRequestError(
+                f"Invalid columns: {', '.join(invalid_columns)}")
+        if not kwargs:
+            return 0
 
-        # Commit the changes to the database
+        criteria = []
+        for key, value in filters.items():
+            column = getattr(User, key)
+            if isinstance(value, (list, tuple, set)):
+                criteria.append(column.in_(list(value)))
+            else:
+                criteria.append(column == value)
+
+        # Loaded users are updated in Python, without another SELECT
+        count = self._session.query(User).filter(*criteria).update(
+            kwargs, synchronize_session="evaluate")
+        self._session.commit()
+        return count
+
+    def add_session_by_email(self, session_id: str, email: str,
+                             expires_at: datetime = None) -> bool:
+        """
+        Adds a login session of the user with this email in a single
+        INSERT ... SELECT: the user isn't loaded.
+
+        Args:
+            session_id (str): The session ID.
+            email (str): The email of the user.
+            expires_at (datetime): Expiry time (UTC), or None if the
+                session never expires.
+
+        Returns:
+            bool: True if the session was added, False if no user has
+            this email.
+        """
+        users = select(
+            literal(session_id, String), User.id,
+            literal(datetime.utcnow(), DateTime),
+            literal(expires_at, DateTime)).where(User.email == email)
+        result = self._session.execute(insert(UserSession).from_select(
+            ["id", "user_id", "created_at", "expires_at"], users))
+        self._session.commit()
+        return result.rowcount == 1
+
+    def find_session_user(self, session_id: str) -> tuple:
+        """
+        Finds the ID and email of the user of a live session, and the
+        session expiry time, without loading any entity.
+
+        Args:
+            session_id (str): The session ID.
+
+        Returns:
+            tuple: (user ID, email, expiry time or None).
+
+        Raises:
+            NoResultFound: If the session doesn't exist or is expired.
+        """
+        row = self._session.query(
+            User.id, User.email, UserSession.expires_at).join(
+            UserSession, UserSession.user_id == User.id).filter(
+            UserSession.id == session_id,
+            or_(UserSession.expires_at.is_(None),
+                UserSession.expires_at > datetime.utcnow())).first()
+
+        if row is None:
+            raise NoResultFound("No session found matching the criteria.")
+
+        return tuple(row)
+
+    def delete_sessions(self, user_id: int, session_id: str = None) -> int:
+        """
+        Deletes one session of a user, or all of them.
+
+        Args:
+            user_id (int): The ID of the user.
+            session_id (str): The session ID, or None for all sessions of
+                the user.
+
+        Returns:
+            int: Number of sessions deleted.
+        """
+        query = self._session.query(UserSession).filter(
+            UserSession.user_id == user_id)
+        if session_id is not None:
+            query = query.filter(UserSession.id == session_id)
+        count = query.delete(synchronize_session=False)
+        self._session.commit()
+        return count
+
+    def purge_expired_sessions(self, batch_size: int = 1000) -> int:
+        """
+        Deletes one batch of expired sessions, found through the index on
+        their expiry time.
+
+        Args:
+            batch_size (int): Maximum number of sessions deleted.
+
+        Returns:
+            int: Number of sessions deleted; less than batch_size once
+            no expired session is left.
+        """
+        expired = select(UserSession.id).where(
+            UserSession.expires_at <= datetime.utcnow()).limit(batch_size)
+        count = self._session.query(UserSession).filter(
+            UserSession.id.in_(expired)).delete(synchronize_session=False)
         self._session.commit()
+        return count
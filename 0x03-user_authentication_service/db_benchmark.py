@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Write and read throughput of DB on SQLite, default vs tuned PRAGMAs.
+
+Each mode runs on a new database file: N users are added one commit at
+a time (as registrations do), then looked up by email from T threads.
+
+Usage: ./db_benchmark.py [-n users] [-r reads] [-t threads]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from db import DB, TUNED_PRAGMAS
+
+
+MODES = {
+    "default": {},
+    "tuned": TUNED_PRAGMAS,
+}
+
+
+def run(path: str, pragmas: dict, users: int, reads: int,
+        threads: int) -> dict:
+    """
+    Time writes then reads on a new database.
+
+    Args:
+        path (str): Path of the database file.
+        pragmas (dict): SQLite PRAGMAs of the connections.
+        users (int): Number of users to add.
+        reads (int): Number of lookups, split between the threads.
+        threads (int): Number of reading threads.
+
+    Returns:
+        dict: Writes and reads per second.
+    """
+    db = DB("sqlite:///" + path, persistent=False, pragmas=pragmas)
+    start = time.perf_counter()
+    for i in range(users):
+        db.add_user("user{}@bench.io".format(i), "hash{}".format(i))
+    writes = users / (time.perf_counter() - start)
+    db.remove_session()
+
+    def read(count: int):
+        for _ in range(count):
+            i = random.randrange(users)
+            db.find_user_by(email="user{}@bench.io".format(i))
+            # Like a request: a fresh session, nothing cached
+            db.remove_session()
+
+    workers = [threading.Thread(target=read, args=(reads // threads,))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    reads = reads // threads * threads / (time.perf_counter() - start)
+    return {"writes": writes, "reads": reads}
+
+
+def main():
+    """Run every mode and print their throughput."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-n", "--users", type=int, default=2000)
+    parser.add_argument("-r", "--reads", type=int, default=20000)
+    parser.add_argument("-t", "--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    print("{:>8} {:>10} {:>10}".format("mode", "writes/s", "reads/s"))
+    try:
+        for mode, pragmas in MODES.items():
+            result = run(os.path.join(workdir, mode + ".db"), pragmas,
+                         args.users, args.reads, args.threads)
+            print("{:>8} {:>10.0f} {:>10.0f}".format(
+                mode, result["writes"], result["reads"]))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Concurrent load generator for the user authentication service.
+
+Many threads each run a random mix of the service's workflows (register,
+log in, profile, log out, reset password) for a fixed duration, either
+in process through the Flask test client (default) or over HTTP against
+a running server (--url). Throughput, latency percentiles and errors are
+reported per endpoint.
+
+The bcrypt work factor of the passwords hashed in process is set with
+--bcrypt-rounds: running at 12 (the default of the service) and at 4
+tells hashing cost apart from framework and database overhead. Against
+a server, start it with BCRYPT_ROUNDS instead (and LOGIN_RATE=0, as all
+logins come from one address).
+
+Usage: ./load_test.py [-t threads] [-d seconds] [--bcrypt-rounds N]
+                      [--mix register=1,login=3,...] [--url URL]
+                      [-o results.json]
+"""
+import argparse
+import http.cookies
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Tuple
+
+
+MIX = "register=1,login=3,profile=10,logout=2,reset=1"
+
+
+def _session_id(set_cookies: List[str]) -> str:
+    """
+    Extract the session_id cookie from Set-Cookie headers.
+
+    Args:
+        set_cookies (List[str]): Values of the Set-Cookie headers.
+
+    Returns:
+        str: The session ID, or None if not set.
+    """
+    for set_cookie in set_cookies:
+        cookie = http.cookies.SimpleCookie(set_cookie)
+        if "session_id" in cookie:
+            return cookie["session_id"].value
+    return None
+
+
+class InProcessClient:
+    """Client calling the app in process through the Flask test client."""
+
+    def __init__(self, app):
+        """Initialize a client; cookies are passed explicitly."""
+        self._client = app.test_client(use_cookies=False)
+
+    def request(self, method: str, path: str, data: dict = None,
+                session_id: str = None) -> Tuple[int, dict, str]:
+        """
+        Send a request.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Path of the route.
+            data (dict): Form data.
+            session_id (str): Value of the session_id cookie, if any.
+
+        Returns:
+            Tuple[int, dict, str]: Status code, JSON body (or None) and
+            session ID set by the response (or None).
+        """
+        headers = {}
+        if session_id is not None:
+            headers["Cookie"] = "session_id={}".format(session_id)
+        response = self._client.open(path, method=method, data=data,
+                                     headers=headers)
+        return (response.status_code, response.get_json(silent=True),
+                _session_id(response.headers.getlist("Set-Cookie")))
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Redirect handler returning redirects as they are."""
+
+    def redirect_request(self, *args, **kwargs):
+        """Don't follow any redirect."""
+        return None
+
+
+class HTTPClient:
+    """Client calling a running server over HTTP."""
+
+    def __init__(self, url: str):
+        """Initialize a client for the server at `url`."""
+        self._url = url.rstrip("/")
+        # Don't follow the redirect of a logout: time the logout only
+        self._opener = urllib.request.build_opener(_NoRedirect)
+
+    def request(self, method: str, path: str, data: dict = None,
+                session_id: str = None) -> Tuple[int, dict, str]:
+        """
+        Send a request.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Path of the route.
+            data (dict): Form data.
+            session_id (str): Value of the session_id cookie, if any.
+
+        Returns:
+            Tuple[int, dict, str]: Status code, JSON body (or None) and
+            session ID set by the response (or None).
+        """
+        body = urllib.parse.urlencode(data).encode() if data else None
+        request = urllib.request.Request(self._url + path, data=body,
+                                         method=method)
+        if session_id is not None:
+            request.add_header("Cookie", "session_id={}".format(session_id))
+        try:
+            response = self._opener.open(request)
+        except urllib.error.HTTPError as e:
+            response = e
+        with response:
+            status, payload = response.status, response.read()
+            set_cookies = response.headers.get_all("Set-Cookie") or []
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            payload = None
+        return status, payload, _session_id(set_cookies)
+
+
+class Stats:
+    """Latencies and errors of each endpoint, shared by all threads."""
+
+    def __init__(self):
+        """Initialize empty statistics."""
+        self._latencies: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float, ok: bool):
+        """Record one request of an endpoint."""
+        with self._lock:
+            self._latencies.setdefault(endpoint, []).append(latency)
+            self._errors[endpoint] = self._errors.get(endpoint, 0) + (not ok)
+
+    def report(self, duration: float) -> List[dict]:
+        """
+        Summarize each endpoint.
+
+        Args:
+            duration (float): Duration of the run in seconds.
+
+        Returns:
+            List[dict]: Per endpoint: requests, errors, requests per
+            second and latency percentiles in milliseconds.
+        """
+        results = []
+        for endpoint, latencies in sorted(self._latencies.items()):
+            latencies = sorted(latencies)
+
+            def percentile(p: int) -> float:
+                i = min(len(latencies) - 1, len(latencies) * p // 100)
+                return latencies[i] * 1000
+
+            results.append({
+                "endpoint": endpoint,
+                "requests": len(latencies),
+                "errors": self._errors[endpoint],
+                "rps": len(latencies) / duration,
+                "p50_ms": percentile(50),
+                "p95_ms": percentile(95),
+                "p99_ms": percentile(99),
+            })
+        return results
+
+
+class VirtualUser:
+    """
+    One thread of the load: a client and the accounts it created.
+
+    Each step runs one workflow, picked at random by weight, on one of
+    the accounts of the thread (registering one first if there is none).
+    """
+
+    def __init__(self, client, number: int, stats: Stats):
+        """Initialize a virtual user without any account."""
+        self._client = client
+        self._prefix = "load{}_{}_{}".format(os.getpid(), int(time.time()),
+                                             number)
+        self._stats = stats
+        # email -> [password, session ID or None]
+        self._accounts: Dict[str, list] = {}
+        self._count = 0
+
+    def _call(self, endpoint: str, expected: int, path: str,
+              data: dict = None, session_id: str = None) -> tuple:
+        """
+        Send a request of an endpoint, record its latency and outcome.
+
+        Returns:
+            tuple: JSON body and session ID set, or None if the status
+            isn't the expected one.
+        """
+        start = time.perf_counter()
+        try:
+            status, body, new_session_id = self._client.request(
+                endpoint.split()[0], path, data, session_id)
+        except Exception:
+            status = None
+        self._stats.record(endpoint, time.perf_counter() - start,
+                           status == expected)
+        return (body, new_session_id) if status == expected else None
+
+    def _account(self) -> str:
+        """Email of a random account, registering one if needed."""
+        if not self._accounts:
+            self.register()
+        if not self._accounts:
+            return None
+        return random.choice(list(self._accounts))
+
+    def _session(self, email: str) -> str:
+        """Session ID of an account, logging it in if needed."""
+        if self._accounts[email][1] is None:
+            self._login(email)
+        return self._accounts[email][1]
+
+    def _login(self, email: str):
+        """Log an account in."""
+        account = self._accounts[email]
+        result = self._call("POST /sessions", 200, "/sessions",
+                            {"email": email, "password": account[0]})
+        account[1] = result[1] if result else None
+
+    def register(self):
+        """POST /users with a new email."""
+        self._count += 1
+        email = "{}_{}@load.test".format(self._prefix, self._count)
+        password = "pwd{}".format(self._count)
+        if self._call("POST /users", 200, "/users",
+                      {"email": email, "password": password}):
+            self._accounts[email] = [password, None]
+
+    def login(self):
+        """POST /sessions with an account."""
+        email = self._account()
+        if email is not None:
+            self._login(email)
+
+    def profile(self):
+        """GET /profile with the session of an account."""
+        email = self._account()
+        if email is not None and self._session(email) is not None:
+            self._call("GET /profile", 200, "/profile",
+                       session_id=self._accounts[email][1])
+
+    def logout(self):
+        """DELETE /sessions of a logged in account."""
+        email = self._account()
+        if email is not None and self._session(email) is not None:
+            self._call("DELETE /sessions", 302, "/sessions",
+                       session_id=self._accounts[email][1])
+            self._accounts[email][1] = None
+
+    def reset(self):
+        """POST then PUT /reset_password with a new password."""
+        email = self._account()
+        if email is None:
+            return
+        result = self._call("POST /reset_password", 200, "/reset_password",
+                            {"email": email})
+        if not result:
+            return
+        password = "new{}".format(random.randrange(1 << 30))
+        if self._call("PUT /reset_password", 200, "/reset_password",
+                      {"email": email, "reset_token": result[0]["reset_token"],
+                       "new_password": password}):
+            self._accounts[email][0] = password
+            # Sessions survive a reset, but log in again with the password
+            self._accounts[email][1] = None
+
+    def run(self, mix: Dict[str, int], deadline: float):
+        """Run random workflows of the mix until the deadline."""
+        workflows = [getattr(self, name) for name in mix]
+        weights = list(mix.values())
+        while time.perf_counter() < deadline:
+            random.choices(workflows, weights)[0]()
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """
+    Parse a workload mix such as "register=1,login=3".
+
+    Raises:
+        argparse.ArgumentTypeError: If a workflow or weight is invalid.
+    """
+    result = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ("register", "login", "profile", "logout",
+                                "reset") or not weight.strip().isdigit():
+            raise argparse.ArgumentTypeError("invalid mix: " + item)
+        result[name.strip()] = int(weight)
+    return result
+
+
+def main():
+    """Run the load and print (and optionally save) the report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-t", "--threads", type=int, default=8)
+    parser.add_argument("-d", "--duration", type=float, default=10.0,
+                        help="seconds of load")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(MIX),
+                        help="weights of the workflows (default: {})"
+                        .format(MIX))
+    parser.add_argument("--bcrypt-rounds", type=int,
+                        help="bcrypt work factor in process (default 12)")
+    parser.add_argument("--url", help="URL of a running server, instead "
+                        "of running the app in process")
+    parser.add_argument("-o", "--output", help="JSON file for the report")
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    if args.url:
+        def new_client():
+            return HTTPClient(args.url)
+    else:
+        if args.bcrypt_rounds is not None:
+            os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+        # All logins come from one address: don't throttle them
+        os.environ.setdefault("LOGIN_RATE", "0")
+        # The app creates its database in the working directory
+        os.chdir(tempfile.mkdtemp())
+        from app import app
+
+        def new_client():
+            return InProcessClient(app)
+
+    stats = Stats()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    threads = [threading.Thread(
+        target=VirtualUser(new_client(), i, stats).run,
+        args=(args.mix, deadline)) for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    results = stats.report(duration)
+    print("{:<22} {:>8} {:>7} {:>8} {:>9} {:>9} {:>9}".format(
+        "endpoint", "requests", "errors", "req/s", "p50 (ms)", "p95 (ms)",
+        "p99 (ms)"))
+    for r in results:
+        print("{:<22} {:>8} {:>7} {:>8.1f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+            r["endpoint"], r["requests"], r["errors"], r["rps"],
+            r["p50_ms"], r["p95_ms"], r["p99_ms"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "threads": args.threads,
+                "duration": duration,
+                "mix": args.mix,
+                "bcrypt_rounds": args.bcrypt_rounds,
+                "url": args.url,
+                "results": results
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,10 +15,8 @@ def register_user(email: str, password: str) -> None:
         data={
             "email": email,
             "password": password})
-    assert response.status_code == 200, f"Expected 200 but got
-    {
-        response.status_code
-        }"
+    assert response.status_code == 200, \
+        f"Expected 200 but got {response.status_code}"
 
 
 def log_in_wrong_password(email: str, password: str) -> None:
@@ -27,9 +25,8 @@ def log_in_wrong_password(email: str, password: str) -> None:
         data={
             "email": email,
             "password": password})
-    assert response.status_code == 401, f"Expected 401 but got{
-        response.status_code
-        }"
+    assert response.status_code == 401, \
+        f"Expected 401 but got {response.status_code}"
 
 
 def log_in(email: str, password: str) -> str:
@@ -38,19 +35,15 @@ def log_in(email: str, password: str) -> str:
         data={
             "email": email,
             "password": password})
-    assert response.status_code == 200, f"Expected 200 but got
-    {
-        response.status_code
-        }"
+    assert response.status_code == 200, \
+        f"Expected 200 but got {response.status_code}"
     return response.cookies["session_id"]
 
 
 def profile_unlogged() -> None:
     response = requests.get(f"{BASE_URL}/profile")
-    assert response.status_code == 403, f"Expected 403 but got
-    {
-        response.status_code
-        }"
+    assert response.status_code == 403, \
+        f"Expected 403 but got {response.status_code}"
 
 
 def profile_logged(session_id: str) -> None:
@@ -58,9 +51,8 @@ def profile_logged(session_id: str) -> None:
         f"{BASE_URL}/profile",
         cookies={
             "session_id": session_id})
-    assert response.status_code == 200, f"Expected 200 but got{
-        response.status_code
-        }"
+    assert response.status_code == 200, \
+        f"Expected 200 but got {response.status_code}"
 
 
 def log_out(session_id: str) -> None:
@@ -68,9 +60,8 @@ def log_out(session_id: str) -> None:
         f"{BASE_URL}/sessions",
         cookies={
             "session_id": session_id})
-    assert response.status_code == 200, f"Expected 200 but got{
-        response.status_code
-        }"
+    assert response.status_code == 200, \
+        f"Expected 200 but got {response.status_code}"
 
 
 def reset_password_token(email: str) -> str:
@@ -78,9 +69,8 @@ def reset_password_token(email: str) -> str:
         f"{BASE_URL}/reset_password",
         data={
             "email": email})
-    assert response.status_code == 200, f"Expected 200 but got{
-        response.status_code
-        }"
+    assert response.status_code == 200, \
+        f"Expected 200 but got {response.status_code}"
     return response.json()["reset_token"]
 
 
@@ -91,9 +81,8 @@ def update_password(email: str, reset_token: str, new_password: str) -> None:
             "email": email,
             "reset_token": reset_token,
             "new_password": new_password})
-    assert response.status_code == 200, f"Expected 200 but got{
-        response.status_code
-        }"
+    assert response.status_code == 200, \
+        f"Expected 200 but got {response.status_code}"
 
 
 if __name__ == "__main__":
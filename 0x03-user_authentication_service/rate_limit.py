@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+This module contains the TokenBucketLimiter class, which throttles
+attempts per key (client address, email...) with one token bucket per
+key, and the TooManyRequests exception raised on throttled attempts.
+"""
+from collections import OrderedDict
+from typing import Hashable, Iterable
+import threading
+import time
+
+
+class TooManyRequests(Exception):
+    """
+    Raised when an attempt is throttled; answered with a 429.
+
+    Attributes:
+        retry_after (float): Seconds until the attempt would be allowed.
+    """
+
+    def __init__(self, retry_after: float):
+        """ Initializes the exception with the time to wait """
+        super().__init__("Too many requests")
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by any hashable value.
+
+    Each bucket holds up to `burst` tokens and refills at `rate` tokens
+    per second; an attempt takes one token from each of its buckets
+    (callers may check() the buckets first and acquire() a token only
+    for the attempts that fail).
+    Buckets live in an LRU of `maxsize` entries: evicting the least
+    recently used one can only forgive a client that went quiet. A rate
+    of 0 disables the limiter.
+    """
+
+    def __init__(self, rate: float, burst: float, maxsize: int):
+        """
+        Initializes a limiter without any bucket.
+
+        Args:
+            rate (float): Tokens added per second to each bucket.
+            burst (float): Capacity of a bucket.
+            maxsize (int): Maximum number of buckets kept.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        # key -> [tokens, time of the last refill]
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """ Number of buckets """
+        return len(self._buckets)
+
+    def check(self, keys: Iterable[Hashable]) -> float:
+        """
+        Tells whether an attempt would be allowed, without taking any
+        token (nor keeping a bucket for a new key).
+
+        Args:
+            keys (Iterable[Hashable]): Keys of the attempt.
+
+        Returns:
+            float: 0 if each key has a token left, otherwise the number
+            of seconds until all of them would.
+        """
+        return self._take(keys, False)
+
+    def acquire(self, keys: Iterable[Hashable]) -> float:
+        """
+        Takes one token from the bucket of each key, if all have one.
+
+        Args:
+            keys (Iterable[Hashable]): Keys of the attempt.
+
+        Returns:
+            float: 0 if the attempt is allowed, otherwise the number of
+            seconds until it would be (no token is taken then).
+        """
+        return self._take(keys, True)
+
+    def _take(self, keys: Iterable[Hashable], take: bool) -> float:
+        """ Refills the buckets of the keys, then takes one token from
+        each if `take` and all have one; see acquire() """
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            buckets = []
+            for key in keys:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    if not take:
+                        # A new bucket is full
+                        continue
+                    bucket = self._buckets[key] = [self.burst, now]
+                else:
+                    self._buckets.move_to_end(key)
+                    bucket[0] = min(self.burst,
+                                    bucket[0] + (now - bucket[1]) * self.rate)
+                    bucket[1] = now
+                buckets.append(bucket)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            missing = max((1 - bucket[0] for bucket in buckets), default=0)
+            if missing > 0:
+                return missing / self.rate
+            if take:
+                for bucket in buckets:
+                    bucket[0] -= 1
+            return 0
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+This module contains the TTLCache class, a bounded mapping whose entries
+expire after a fixed time and which evicts the least recently used entry
+once full.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a time-to-live per entry.
+
+    Entries are dropped `ttl` seconds after being set, and the least
+    recently used entry is evicted when a new one would exceed `maxsize`.
+    A cache of `maxsize` 0 keeps nothing.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Initializes an empty cache.
+
+        Args:
+            maxsize (int): Maximum number of entries.
+            ttl (float): Lifetime of an entry in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """ Number of entries, expired ones included """
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the value of a live entry and marks it as recently used.
+
+        Args:
+            key: Key of the entry.
+            default: Value returned if there is no live entry.
+
+        Returns:
+            The cached value, or default.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        """
+        Adds or replaces an entry, evicting the least recently used one
+        if the cache is full.
+
+        Args:
+            key: Key of the entry.
+            value: Value to cache.
+            ttl (float): Lifetime of this entry, if shorter than the
+                cache's.
+        """
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Removes an entry.
+
+        Args:
+            key: Key of the entry.
+            default: Value returned if there is no entry.
+
+        Returns:
+            The value of the removed entry, or default.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def remove_if(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        Removes the entries whose value matches a predicate, scanning
+        the whole cache.
+
+        Args:
+            predicate (Callable): Tells whether to remove a value.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            keys = [key for key, (_, value) in self._entries.items()
+                    if predicate(value)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        """ Removes every entry """
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+UserSession model definition
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+
+from user import Base
+
+
+class UserSession(Base):
+    """
+    SQLAlchemy model for the `sessions` table: one row per login session,
+    looked up by its primary key. `expires_at` is indexed so that expired
+    sessions can be purged without a full scan, and `user_id` so that all
+    sessions of a user can be found.
+    """
+    __tablename__ = 'sessions'
+
+    id = Column(String(250), primary_key=True, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'),
+                     nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=True, index=True)